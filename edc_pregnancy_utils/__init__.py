@@ -1,3 +1,4 @@
+from .dating import PregnancyDating
 from .edd import Edd
 from .ga import Ga
 from .lmp import Lmp
@@ -0,0 +1,93 @@
+"""A pandas DataFrame accessor for EDD and GA.
+
+Importing this module registers the `pregnancy` accessor, for example:
+
+    from edc_pregnancy_utils import accessors
+
+    df[['edd', 'edd_method', 'edd_diffdays']] = df.pregnancy.edd(
+        lmp='lmp', reference_date='report_datetime')
+
+Column arguments name the DataFrame columns to use. Pass None for an input
+the DataFrame does not have to treat it as all missing; a name that is not
+a column raises KeyError. Date columns may be datetime64 (naive or tz-aware),
+Arrow-backed date/timestamp or, slowest, python dates.
+"""
+import numpy as np
+import pandas as pd
+
+from . import vectorized
+
+
+def _date_column(series, size):
+    if series is None:
+        return vectorized.column(None, size=size)
+    if isinstance(series.dtype, pd.ArrowDtype):
+        from .arrow import date_column
+        return date_column(series.array.__arrow_array__(), size)
+    if not pd.api.types.is_datetime64_any_dtype(series.dtype):
+        series = pd.to_datetime(series)
+    if getattr(series.dt, 'tz', None) is not None:
+        series = series.dt.tz_localize(None)
+    values = series.to_numpy(dtype='datetime64[ns]').astype('datetime64[D]').view(np.int64)
+    return vectorized.column(values, series.notna().to_numpy())
+
+
+def _int_column(series, size):
+    if series is None:
+        return vectorized.column(None, size=size)
+    return vectorized.column(
+        series.to_numpy(dtype=np.int64, na_value=0), series.notna().to_numpy())
+
+
+def _dates(values, mask):
+    dates = values.astype('datetime64[D]').astype('datetime64[s]')
+    dates[~mask] = np.datetime64('NaT')
+    return dates
+
+
+@pd.api.extensions.register_dataframe_accessor('pregnancy')
+class PregnancyAccessor:
+
+    def __init__(self, df):
+        self._df = df
+
+    def _column(self, name):
+        return None if name is None else self._df[name]
+
+    def _dating(self, lmp, reference_date, ultrasound_date, ga_confirmed_weeks,
+                ga_confirmed_days, ultrasound_edd, prefer_ultrasound=True):
+        size = len(self._df)
+        return vectorized.dating(
+            _date_column(self._column(lmp), size),
+            _date_column(self._column(reference_date), size),
+            _date_column(self._column(ultrasound_date), size),
+            _int_column(self._column(ga_confirmed_weeks), size),
+            _int_column(self._column(ga_confirmed_days), size),
+            _date_column(self._column(ultrasound_edd), size),
+            prefer_ultrasound=prefer_ultrasound)
+
+    def edd(self, lmp='lmp', reference_date='reference_date', ultrasound_date=None,
+            ga_confirmed_weeks=None, ga_confirmed_days=None, ultrasound_edd=None):
+        """Returns a DataFrame of `edd`, `edd_method` and `edd_diffdays` as Edd would."""
+        result = self._dating(
+            lmp, reference_date, ultrasound_date, ga_confirmed_weeks, ga_confirmed_days,
+            ultrasound_edd)
+        return pd.DataFrame({
+            'edd': _dates(result['edd'], result['edd_mask']),
+            'edd_method': pd.arrays.IntegerArray(
+                result['edd_method'], ~result['edd_method_mask']),
+            'edd_diffdays': pd.arrays.IntegerArray(
+                result['edd_diffdays'], ~result['edd_diffdays_mask'])}, index=self._df.index)
+
+    def ga(self, lmp='lmp', reference_date='reference_date', ultrasound_date=None,
+           ga_confirmed_weeks=None, ga_confirmed_days=None, ultrasound_edd=None,
+           prefer_ultrasound=True):
+        """Returns a DataFrame of `ga_weeks`, `ga_days` and `ga_method` as Ga would."""
+        result = self._dating(
+            lmp, reference_date, ultrasound_date, ga_confirmed_weeks, ga_confirmed_days,
+            ultrasound_edd, prefer_ultrasound=prefer_ultrasound)
+        return pd.DataFrame({
+            'ga_weeks': pd.arrays.IntegerArray(result['ga_weeks'], ~result['ga_weeks_mask']),
+            'ga_days': pd.arrays.IntegerArray(result['ga_days'], ~result['ga_days_mask']),
+            'ga_method': pd.arrays.IntegerArray(
+                result['ga_method'], ~result['ga_method_mask'])}, index=self._df.index)
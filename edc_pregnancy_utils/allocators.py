@@ -0,0 +1,89 @@
+"""Allocation of infant sequence numbers from per-site blocks.
+
+An InfantSequenceAllocator reserves a block of sequence numbers for a study
+site in one short transaction on a counter row (a concrete model of
+InfantSequenceModelMixin) and then hands them out from memory. Concurrent
+deliveries only meet on the counter row once per `block_size` infants,
+instead of on every save.
+
+Blocks are reserved on a connection of their own, see `sequence_database`,
+so the counter row is locked only for the reservation and never for the
+rest of a caller's transaction, such as an admin change form. Numbers in
+a block that a rolled back delivery used, or that are left when a process
+exits, are never used again, so sequences are unique per site but may
+have gaps.
+"""
+import os
+import threading
+
+from django.db import connections, router, transaction
+
+_allocators = {}
+
+
+def sequence_database(alias):
+    """Returns a database alias with its own connection to the database of `alias`.
+
+    The alias, `<alias>_infant_sequence`, is added to the connection
+    handler on first use with the settings of `alias`. SQLite allows one
+    writer at a time, so a second connection would wait on the caller's
+    transaction; for SQLite `alias` itself is returned."""
+    if connections[alias].vendor == 'sqlite':
+        return alias
+    sequence_alias = '{}_infant_sequence'.format(alias)
+    if sequence_alias not in connections.settings:
+        connections.settings[sequence_alias] = dict(connections[alias].settings_dict)
+    return sequence_alias
+
+
+class InfantSequenceAllocator:
+
+    def __init__(self, model, block_size=100, using=None):
+        """Hands out sequence numbers from blocks reserved on `model`.
+
+        `using` is the database alias to reserve blocks on, by default
+        `sequence_database` of the model's database. It should not be an
+        alias the caller saves deliveries on, see `allocate`."""
+        self.model = model
+        self.block_size = block_size
+        self.using = using or sequence_database(router.db_for_write(model))
+        self.blocks = {}
+        self.pid = os.getpid()
+        self.lock = threading.Lock()
+
+    def allocate(self, study_site, count=1):
+        """Returns a list of `count` unused sequence numbers for the site.
+
+        If the reserving connection is itself in a transaction, only `count`
+        numbers are reserved and none are kept, so a rollback cannot return
+        numbers this process holds. This only happens on SQLite or if
+        `using` is the caller's alias."""
+        with self.lock:
+            if self.pid != os.getpid():
+                self.blocks, self.pid = {}, os.getpid()
+            if transaction.get_connection(self.using).in_atomic_block:
+                return list(range(*self.reserve(study_site, count)))
+            start, stop = self.blocks.get(study_site, (0, 0))
+            if stop - start < count:
+                start, stop = self.reserve(study_site, max(self.block_size, count))
+            self.blocks[study_site] = (start + count, stop)
+            return list(range(start, start + count))
+
+    def reserve(self, study_site, size):
+        """Returns the (start, stop) of a new block of `size` numbers."""
+        with transaction.atomic(using=self.using):
+            queryset = self.model.objects.using(self.using).select_for_update()
+            counter, _ = queryset.get_or_create(study_site=study_site)
+            start = counter.next_sequence
+            counter.next_sequence = start + size
+            counter.save(using=self.using, update_fields=['next_sequence'])
+        return start, start + size
+
+
+def get_allocator(model, block_size=100, using=None):
+    """Returns the process-wide allocator for `model`."""
+    label = model._meta.label_lower
+    if label not in _allocators:
+        _allocators[label] = InfantSequenceAllocator(
+            model, block_size=block_size, using=using)
+    return _allocators[label]
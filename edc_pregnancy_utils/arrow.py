@@ -0,0 +1,107 @@
+"""Arrow-native EDD and GA calculation.
+
+Accepts `date32` or `timestamp` arrays (or chunked arrays) and integer arrays
+for the confirmed GA weeks and days, and returns a `pyarrow.Table`. Nulls
+are treated as None is by Lmp, Ultrasound, Edd and Ga. Date buffers are read
+as numpy views, no python date objects are created.
+
+For Polars, pass `series.to_arrow()` and wrap the result with `polars.from_arrow()`.
+"""
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from . import vectorized
+
+
+def _combine(array):
+    if isinstance(array, pa.ChunkedArray):
+        array = array.combine_chunks() if array.num_chunks != 1 else array.chunk(0)
+    return array
+
+
+def _mask(array):
+    if array.null_count == 0:
+        return None
+    return array.is_valid().to_numpy(zero_copy_only=False)
+
+
+def date_column(array, size=None):
+    """Returns a vectorized.Column of days since 1970-01-01 for a date or timestamp array."""
+    if array is None:
+        return vectorized.column(None, size=size)
+    array = _combine(array)
+    if array.null_count == len(array):
+        return vectorized.column(None, size=len(array))
+    if pa.types.is_timestamp(array.type):
+        if array.type.tz is not None:
+            array = pc.local_timestamp(array)
+        array = pc.cast(array, pa.date32(), safe=False)
+    elif pa.types.is_date64(array.type):
+        array = pc.cast(array, pa.date32())
+    elif not pa.types.is_date32(array.type):
+        raise TypeError('Expected a date or timestamp array. Got {}.'.format(array.type))
+    values = np.frombuffer(
+        array.buffers()[1], dtype=np.int32, count=len(array) + array.offset)[array.offset:]
+    return vectorized.column(values, _mask(array))
+
+
+def int_column(array, size=None):
+    """Returns a vectorized.Column for an integer array."""
+    if array is None:
+        return vectorized.column(None, size=size)
+    array = _combine(array)
+    if not pa.types.is_integer(array.type):
+        raise TypeError('Expected an integer array. Got {}.'.format(array.type))
+    return vectorized.column(
+        array.fill_null(0).to_numpy(zero_copy_only=False), _mask(array))
+
+
+def _date32(values, mask):
+    return pa.array(values.astype(np.int32), mask=~mask).cast(pa.date32())
+
+
+def _to_arrow(values, mask, type):
+    return pa.array(values.astype(type.to_pandas_dtype(), copy=False), type=type, mask=~mask)
+
+
+def _dating(lmp, reference_date, ultrasound_date=None, ga_confirmed_weeks=None,
+            ga_confirmed_days=None, ultrasound_edd=None, prefer_ultrasound=True):
+    size = len(lmp)
+    return vectorized.dating(
+        date_column(lmp),
+        date_column(reference_date, size),
+        date_column(ultrasound_date, size),
+        int_column(ga_confirmed_weeks, size),
+        int_column(ga_confirmed_days, size),
+        date_column(ultrasound_edd, size),
+        prefer_ultrasound=prefer_ultrasound)
+
+
+def edd(lmp, reference_date, ultrasound_date=None, ga_confirmed_weeks=None,
+        ga_confirmed_days=None, ultrasound_edd=None):
+    """Returns a table of `edd` (date32), `edd_method` and `edd_diffdays` for each row."""
+    result = _dating(
+        lmp, reference_date, ultrasound_date, ga_confirmed_weeks, ga_confirmed_days,
+        ultrasound_edd)
+    return pa.table({
+        'edd': _date32(result['edd'], result['edd_mask']),
+        'edd_method': _to_arrow(
+            result['edd_method'], result['edd_method_mask'], pa.int8()),
+        'edd_diffdays': _to_arrow(
+            result['edd_diffdays'], result['edd_diffdays_mask'], pa.int32())})
+
+
+def ga(lmp, reference_date, ultrasound_date=None, ga_confirmed_weeks=None,
+       ga_confirmed_days=None, ultrasound_edd=None, prefer_ultrasound=True):
+    """Returns a table of `ga_weeks`, `ga_days` and `ga_method` for each row."""
+    result = _dating(
+        lmp, reference_date, ultrasound_date, ga_confirmed_weeks, ga_confirmed_days,
+        ultrasound_edd, prefer_ultrasound=prefer_ultrasound)
+    return pa.table({
+        'ga_weeks': _to_arrow(
+            result['ga_weeks'], result['ga_weeks_mask'], pa.int16()),
+        'ga_days': _to_arrow(
+            result['ga_days'], result['ga_days_mask'], pa.int16()),
+        'ga_method': _to_arrow(
+            result['ga_method'], result['ga_method_mask'], pa.int8())})
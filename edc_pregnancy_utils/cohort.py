@@ -0,0 +1,151 @@
+"""A compact fixed-width binary file of Lmp and Ultrasound inputs.
+
+The file is a 16 byte header followed by one 20 byte little-endian record
+per row (see RECORD_DTYPE). Dates are `date.toordinal()` day numbers, GA
+weeks and days are int8 and `nulls` is a bitmap of missing fields (see
+NULL_BITS). Read it with `read_cohort`, which memory-maps the records so
+loading is immediate and worker processes share the same pages:
+
+    with CohortWriter('cohort.bin') as writer:
+        writer.write(lmp=lmp, reference_date=reference_date, ...)
+
+    cohort = read_cohort('cohort.bin')
+    result = cohort.dating(start=0, stop=1_000_000)
+"""
+import os
+import struct
+from datetime import date
+
+import numpy as np
+
+from . import vectorized
+
+MAGIC = b'EDCPREG\x00'
+VERSION = 1
+HEADER = struct.Struct('<8sHHI')
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+RECORD_DTYPE = np.dtype([
+    ('lmp', '<i4'),
+    ('reference_date', '<i4'),
+    ('ultrasound_date', '<i4'),
+    ('ultrasound_edd', '<i4'),
+    ('ga_confirmed_weeks', 'i1'),
+    ('ga_confirmed_days', 'i1'),
+    ('nulls', 'u1'),
+    ('reserved', 'u1'),
+])
+
+FIELDS = (
+    'lmp', 'reference_date', 'ultrasound_date', 'ga_confirmed_weeks',
+    'ga_confirmed_days', 'ultrasound_edd')
+
+NULL_BITS = {name: 1 << index for index, name in enumerate(FIELDS)}
+
+
+class CohortFileError(Exception):
+    pass
+
+
+class CohortWriter:
+
+    def __init__(self, path):
+        """Writes records to a new cohort file, call `write` once per batch."""
+        self.path = path
+        self.count = 0
+        self._file = open(path, 'wb')
+        self._file.write(HEADER.pack(MAGIC, VERSION, RECORD_DTYPE.itemsize, 0))
+
+    def write(self, lmp=None, reference_date=None, ultrasound_date=None,
+              ga_confirmed_weeks=None, ga_confirmed_days=None, ultrasound_edd=None):
+        """Appends a batch of rows, each argument a vectorized.Column or None.
+
+        Date values must be `date.toordinal()` day numbers, add EPOCH_ORDINAL
+        to days since 1970-01-01."""
+        columns = dict(
+            lmp=lmp, reference_date=reference_date, ultrasound_date=ultrasound_date,
+            ga_confirmed_weeks=ga_confirmed_weeks, ga_confirmed_days=ga_confirmed_days,
+            ultrasound_edd=ultrasound_edd)
+        sizes = {len(c.values) for c in columns.values() if c is not None}
+        if len(sizes) != 1:
+            raise CohortFileError('Expected columns of equal length. Got {}.'.format(sizes))
+        records = np.zeros(sizes.pop(), dtype=RECORD_DTYPE)
+        for name, col in columns.items():
+            if col is None:
+                records['nulls'] |= NULL_BITS[name]
+            else:
+                values = np.where(col.mask, col.values, 0)
+                info = np.iinfo(RECORD_DTYPE[name])
+                if len(values) and (values.min() < info.min or values.max() > info.max):
+                    raise CohortFileError(
+                        'Value out of range for {}. Expected {} to {}.'.format(
+                            name, info.min, info.max))
+                records[name] = values
+                records['nulls'] |= np.where(col.mask, 0, NULL_BITS[name]).astype(np.uint8)
+        records.tofile(self._file)
+        self.count += len(records)
+
+    def close(self):
+        """Writes the record count to the header and closes the file."""
+        self._file.seek(0)
+        self._file.write(HEADER.pack(MAGIC, VERSION, RECORD_DTYPE.itemsize, self.count))
+        self._file.close()
+
+    def abort(self):
+        """Closes the file leaving a count of 0, which read_cohort rejects
+        if any records were written."""
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+class Cohort:
+
+    def __init__(self, records):
+        """A wrapper of memory-mapped cohort records."""
+        self.records = records
+
+    def __len__(self):
+        return len(self.records)
+
+    def column(self, name, start=None, stop=None):
+        """Returns a vectorized.Column for a field of rows start to stop."""
+        records = self.records[start:stop]
+        mask = (records['nulls'] & NULL_BITS[name]) == 0
+        return vectorized.column(records[name], mask)
+
+    def dating(self, start=None, stop=None, prefer_ultrasound=True):
+        """Returns vectorized.dating results for rows start to stop.
+
+        Result dates are `date.toordinal()` day numbers."""
+        return vectorized.dating(
+            *[self.column(name, start, stop) for name in FIELDS],
+            prefer_ultrasound=prefer_ultrasound)
+
+
+def read_cohort(path):
+    """Returns a Cohort memory-mapping the records in the file at `path`."""
+    with open(path, 'rb') as f:
+        header = f.read(HEADER.size)
+    if len(header) != HEADER.size:
+        raise CohortFileError('Not a cohort file. Got {}.'.format(path))
+    magic, version, record_size, count = HEADER.unpack(header)
+    if magic != MAGIC or version != VERSION or record_size != RECORD_DTYPE.itemsize:
+        raise CohortFileError(
+            'Not a version {} cohort file. Got {}.'.format(VERSION, path))
+    expected_size = HEADER.size + count * record_size
+    if os.path.getsize(path) != expected_size:
+        raise CohortFileError(
+            'Cohort file is incomplete. Expected {} records. Got {}.'.format(count, path))
+    if count == 0:
+        return Cohort(np.zeros(0, dtype=RECORD_DTYPE))
+    return Cohort(np.memmap(
+        path, dtype=RECORD_DTYPE, mode='r', offset=HEADER.size, shape=(count, )))
@@ -1,2 +1,8 @@
 LMP = 0
 ULTRASOUND = 1
+
+ULTRASOUND_OK = 0
+ULTRASOUND_MISSING = 1
+ULTRASOUND_INVALID_WEEKS = 2
+ULTRASOUND_INVALID_DAYS = 3
+ULTRASOUND_GA_MISMATCH = 4
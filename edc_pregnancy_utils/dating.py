@@ -0,0 +1,145 @@
+from datetime import date
+
+from dateutil.relativedelta import relativedelta
+
+from .constants import (
+    LMP, ULTRASOUND, ULTRASOUND_OK, ULTRASOUND_INVALID_WEEKS, ULTRASOUND_INVALID_DAYS,
+    ULTRASOUND_GA_MISMATCH)
+from .ultrasound import UltrasoundError
+
+
+def ultrasound_status(ultrasound_date, ultrasound_edd, weeks, days):
+    """Returns the status of an ultrasound given day ordinals and the confirmed
+    GA weeks and days, ULTRASOUND_OK if Ultrasound would accept it."""
+    if not 0 < weeks < 40:
+        return ULTRASOUND_INVALID_WEEKS
+    if not 0 <= days <= 6:
+        return ULTRASOUND_INVALID_DAYS
+    if int((280 - (ultrasound_edd - ultrasound_date)) / 7.0) != weeks:
+        return ULTRASOUND_GA_MISMATCH
+    return ULTRASOUND_OK
+
+
+class PregnancyDating:
+
+    def __init__(self, lmp=None, reference_date=None, ultrasound_date=None,
+                 ga_confirmed_weeks=None, ga_confirmed_days=None, ultrasound_edd=None):
+        """Calculates what Lmp, Ultrasound, Edd and Ga would in a single pass.
+
+        Dates are converted to day ordinals once and the LMP GA is calculated once;
+        Ga's GA from the LMP against the ultrasound date is only used when there is
+        no ultrasound, so it is always the GA against the reference date.
+
+        An LMP without a reference date is treated as missing. Raises
+        UltrasoundError for an invalid ultrasound, as does Ultrasound."""
+        self.lmp = None
+        self.reference_date = None
+        self.lmp_edd = None
+        self.lmp_ga_weeks = None
+        self.ultrasound_date = None
+        self.ultrasound_edd = None
+        self.ultrasound_ga_days = None
+        self.edd = None
+        self.edd_method = None
+        self.diffdays = None
+        self.ga_days = None
+        self.ga_method = None
+        self.ga_days_lmp_preferred = None
+        self.ga_method_lmp_preferred = None
+        if lmp and reference_date:
+            self._set_lmp(lmp.toordinal(), reference_date.toordinal())
+        if ultrasound_date and ultrasound_edd and ga_confirmed_weeks is not None:
+            self._set_ultrasound(
+                ultrasound_date.toordinal(), ultrasound_edd.toordinal(),
+                ga_confirmed_weeks, ga_confirmed_days or 0)
+        self._set_edd()
+        self._set_ga()
+
+    def _set_lmp(self, lmp, reference_date):
+        self.lmp = date.fromordinal(lmp)
+        self.reference_date = date.fromordinal(reference_date)
+        self.lmp_edd = date.fromordinal(lmp + 280)
+        self.lmp_ga_weeks = int(40 - abs(lmp + 280 - reference_date) / 7.0)
+
+    def _set_ultrasound(self, ultrasound_date, ultrasound_edd, weeks, days):
+        self.ultrasound_ga_days = self._validate_ultrasound(
+            ultrasound_date, ultrasound_edd, weeks, days)
+        self.ultrasound_date = date.fromordinal(ultrasound_date)
+        self.ultrasound_edd = date.fromordinal(ultrasound_edd)
+
+    def _set_edd(self):
+        if self.lmp_edd and self.ultrasound_edd:
+            weeks = self.lmp_ga_weeks
+            if 16 <= weeks <= 21:
+                tolerance = 10
+            elif 22 <= weeks <= 27:
+                tolerance = 14
+            elif 28 <= weeks:
+                tolerance = 21
+            else:
+                return
+            self.diffdays = abs((self.lmp_edd - self.ultrasound_edd).days)
+            if self.diffdays <= tolerance:
+                self.edd, self.edd_method = self.lmp_edd, LMP
+            else:
+                self.edd, self.edd_method = self.ultrasound_edd, ULTRASOUND
+        elif self.lmp_edd:
+            self.edd, self.edd_method = self.lmp_edd, LMP
+        elif self.ultrasound_edd:
+            self.edd, self.edd_method = self.ultrasound_edd, ULTRASOUND
+
+    def _set_ga(self):
+        lmp_ga_days = self.lmp_ga_weeks * 7 if self.lmp_ga_weeks else None
+        if self.ultrasound_ga_days is not None:
+            self.ga_days, self.ga_method = self.ultrasound_ga_days, ULTRASOUND
+        elif lmp_ga_days is not None:
+            self.ga_days, self.ga_method = lmp_ga_days, LMP
+        if lmp_ga_days is not None:
+            self.ga_days_lmp_preferred, self.ga_method_lmp_preferred = lmp_ga_days, LMP
+        elif self.ultrasound_ga_days is not None:
+            self.ga_days_lmp_preferred = self.ultrasound_ga_days
+            self.ga_method_lmp_preferred = ULTRASOUND
+
+    def _validate_ultrasound(self, ultrasound_date, ultrasound_edd, weeks, days):
+        """Returns the ultrasound GA in days or raises UltrasoundError, as Ultrasound."""
+        status = ultrasound_status(ultrasound_date, ultrasound_edd, weeks, days)
+        if status == ULTRASOUND_INVALID_WEEKS:
+            raise UltrasoundError(
+                'Invalid Ultrasound GA weeks, expected 0 < ga_weeks < 40. '
+                'Got {}'.format(weeks))
+        if status == ULTRASOUND_INVALID_DAYS:
+            raise UltrasoundError(
+                'Invalid Ultrasound GA days, expected 0 <= ga_days <= 6. Got {}'.format(days))
+        if status == ULTRASOUND_GA_MISMATCH:
+            tdelta = ultrasound_edd - ultrasound_date
+            raise UltrasoundError(
+                'Ultrasound GA confirmed and GA calculated do not match. '
+                'Got ultrasound GA={}wks using confirmed ({}wks, {}days) and '
+                'calculated GA={}wks using the ultrasound EDD {} - '
+                'report date {} ({}wks).'.format(
+                    weeks, weeks, days, int((280 - tdelta) / 7.0),
+                    date.fromordinal(ultrasound_edd), date.fromordinal(ultrasound_date),
+                    int(tdelta / 7.0)))
+        return weeks * 7 + days
+
+    @property
+    def ga(self):
+        """Returns the GA as Ga(prefer_ultrasound=True).ga."""
+        return None if self.ga_days is None else relativedelta(days=self.ga_days)
+
+    @property
+    def ga_weeks(self):
+        return None if self.ga_days is None else int(self.ga_days / 7.0)
+
+    @property
+    def ga_lmp_preferred(self):
+        """Returns the GA as Ga(prefer_ultrasound=False).ga."""
+        if self.ga_days_lmp_preferred is None:
+            return None
+        return relativedelta(days=self.ga_days_lmp_preferred)
+
+    @property
+    def ga_weeks_lmp_preferred(self):
+        if self.ga_days_lmp_preferred is None:
+            return None
+        return int(self.ga_days_lmp_preferred / 7.0)
@@ -1,6 +1,3 @@
-from datetime import date
-from dateutil.relativedelta import relativedelta
-
 from .constants import ULTRASOUND, LMP
 from .lmp import Lmp
 from .ultrasound import Ultrasound
@@ -15,45 +12,33 @@ class Edd:
         self.diffdays = None
         self.lmp = lmp or Lmp()
         self.ultrasound = ultrasound or Ultrasound()
-        try:
+        if self.lmp.edd and self.ultrasound.edd:
             self.edd, self.method, self.diffdays = self.get_edd()
-        except TypeError:
-            if self.lmp.edd:
-                self.edd = self.lmp.edd
-                self.method = LMP
-            elif self.ultrasound.edd:
-                self.edd = self.ultrasound.edd
-                self.method = ULTRASOUND
-        try:
-            self.edd = self.edd.date()
-        except AttributeError:
-            pass
+        elif self.lmp.edd:
+            self.edd = self.lmp.edd
+            self.method = LMP
+        elif self.ultrasound.edd:
+            self.edd = self.ultrasound.edd
+            self.method = ULTRASOUND
 
     def get_edd(self):
         edd = None
         method = None
         diffdays = abs((self.lmp.edd - self.ultrasound.edd).days)
-        dt = date.today()
-        if dt + relativedelta(weeks=16) <= dt + self.lmp.ga <= dt + (relativedelta(weeks=21) + relativedelta(days=6)):
-            if 0 <= diffdays <= 10:
-                edd = self.lmp.edd
-                method = LMP
-            elif 10 < diffdays:
-                edd = self.ultrasound.edd
-                method = ULTRASOUND
-        elif (dt + (relativedelta(weeks=21) + relativedelta(days=6)) < dt + self.lmp.ga <=
-                dt + (relativedelta(weeks=27) + relativedelta(days=6))):
-            if 0 <= diffdays <= 14:
-                edd = self.lmp.edd
-                method = LMP
-            elif 14 < diffdays:
-                edd = self.ultrasound.edd
-                method = ULTRASOUND
-        elif dt + (relativedelta(weeks=27) + relativedelta(days=6)) < dt + self.lmp.ga:
-            if 0 <= diffdays <= 21:
+        weeks = self.lmp.ga.weeks
+        if 16 <= weeks <= 21:
+            tolerance = 10
+        elif 22 <= weeks <= 27:
+            tolerance = 14
+        elif 28 <= weeks:
+            tolerance = 21
+        else:
+            tolerance = None
+        if tolerance is not None:
+            if diffdays <= tolerance:
                 edd = self.lmp.edd
                 method = LMP
-            elif 21 < diffdays:
+            else:
                 edd = self.ultrasound.edd
                 method = ULTRASOUND
         return edd, method, diffdays if edd else None
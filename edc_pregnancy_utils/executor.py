@@ -0,0 +1,47 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from .dating import PregnancyDating
+from .ultrasound import UltrasoundError
+
+
+class DatingExecutor:
+
+    def __init__(self, max_workers=None, chunk_size=1000):
+        """Calculates PregnancyDating for batches of records on a thread pool.
+
+        The calculators hold no shared state, so on a free-threaded (no-GIL)
+        build throughput scales with the number of threads.
+
+            with DatingExecutor(max_workers=8) as executor:
+                results = executor.map(records)
+        """
+        self.chunk_size = chunk_size
+        self.pool = ThreadPoolExecutor(max_workers=max_workers)
+
+    @staticmethod
+    def calculate(record):
+        """Returns a PregnancyDating for a dict of its arguments or the UltrasoundError."""
+        try:
+            return PregnancyDating(**record)
+        except UltrasoundError as e:
+            return e
+
+    def calculate_chunk(self, records):
+        return [self.calculate(record) for record in records]
+
+    def map(self, records):
+        """Returns a list of results in the order of `records`."""
+        records = list(records)
+        chunks = [records[i:i + self.chunk_size]
+                  for i in range(0, len(records), self.chunk_size)]
+        return [result for results in self.pool.map(self.calculate_chunk, chunks)
+                for result in results]
+
+    def shutdown(self):
+        self.pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
@@ -9,13 +9,12 @@ class Ga:
 
         by default, if both Lmp and Ultrasound are provided, Ultrasound is used."""
         self.ultrasound = ultrasound or Ultrasound()
-        try:
-            if prefer_ultrasound:
-                self.lmp = Lmp(lmp=lmp.date, reference_date=self.ultrasound.ultrasound_date or lmp.reference_date)
-            else:
-                self.lmp = Lmp(lmp=lmp.date, reference_date=lmp.reference_date or self.ultrasound.ultrasound_date)
-        except AttributeError:
+        if lmp is None or not lmp.date:
             self.lmp = Lmp()
+        elif prefer_ultrasound:
+            self.lmp = Lmp(lmp=lmp.date, reference_date=self.ultrasound.ultrasound_date or lmp.reference_date)
+        else:
+            self.lmp = Lmp(lmp=lmp.date, reference_date=lmp.reference_date or self.ultrasound.ultrasound_date)
         self.ga = None
         self.method = None
         if prefer_ultrasound:
@@ -26,13 +25,9 @@ class Ga:
         else:
             if self.lmp.ga:
                 self.ga, self.method = self.lmp.ga, LMP
-            elif ultrasound.ga:
+            elif self.ultrasound.ga:
                 self.ga, self.method = self.ultrasound.ga, ULTRASOUND
 
     @property
     def weeks(self):
-        try:
-            weeks = self.ga.weeks
-        except AttributeError:
-            weeks = None
-        return weeks
+        return None if self.ga is None else self.ga.weeks
@@ -0,0 +1,128 @@
+"""Checkpointed, resumable recomputation of EDD and GA.
+
+A RecomputationJob pulls rows in key order from a `fetch(after_key, limit)`
+callable, calculates each with PregnancyDating and appends one JSON line
+per row to the output file. After every `checkpoint_every` batches the
+output is flushed to disk and the last key and output size are written
+to the checkpoint file. A job restarted with the same paths truncates the
+output back to the checkpoint and continues after the last key, so the
+output is the same however many times the job was interrupted.
+
+Keys are written to the output and checkpoint by `encode_key`: ints and
+strings as they are, anything else, for example a UUID, as `str(key)`.
+`fetch` is always passed the encoded key, so compare it as that type.
+
+For example, with a Django model:
+
+    def fetch(after_key, limit):
+        qs = MyModel.objects.order_by('pk').values('pk', 'lmp', 'reference_date', ...)
+        if after_key is not None:
+            qs = qs.filter(pk__gt=after_key)  # a str for a UUID pk
+        return [(row.pop('pk'), row) for row in qs[:limit]]
+
+    RecomputationJob(fetch, 'dating.ndjson').run()
+"""
+import json
+import os
+import time
+
+from collections import namedtuple
+
+from .dating import PregnancyDating
+from .ultrasound import UltrasoundError
+
+BatchStats = namedtuple('BatchStats', 'batch rows seconds rows_per_second')
+
+
+class CheckpointError(Exception):
+    pass
+
+
+def encode_key(key):
+    """Returns the key as written to the output and checkpoint."""
+    return key if isinstance(key, (int, str)) else str(key)
+
+
+class RecomputationJob:
+
+    def __init__(self, fetch, output_path, checkpoint_path=None, batch_size=10000,
+                 checkpoint_every=1, on_batch=None):
+        self.fetch = fetch
+        self.output_path = output_path
+        self.checkpoint_path = checkpoint_path or '{}.checkpoint'.format(output_path)
+        self.batch_size = batch_size
+        self.checkpoint_every = checkpoint_every
+        self.on_batch = on_batch
+        self.batches = []
+        self.last_key = None
+        self.rows = 0
+
+    def run(self):
+        """Runs or resumes the job to the last row, returns the number of rows output."""
+        checkpoint = self.read_checkpoint()
+        self.last_key = checkpoint['last_key']
+        self.rows = checkpoint['rows']
+        offset = checkpoint['offset']
+        size = os.path.getsize(self.output_path) if os.path.exists(self.output_path) else 0
+        if size < offset:
+            raise CheckpointError(
+                'Output is shorter than the checkpoint. Expected at least {} bytes. '
+                'Got {} bytes in {}.'.format(offset, size, self.output_path))
+        with open(self.output_path, 'a+b') as output:
+            output.truncate(offset)
+            output.seek(offset)
+            batch = len(self.batches)
+            while True:
+                start = time.perf_counter()
+                rows = self.fetch(self.last_key, self.batch_size)
+                if not rows:
+                    break
+                output.write(b''.join(self.calculate(key, inputs) for key, inputs in rows))
+                self.last_key = encode_key(rows[-1][0])
+                self.rows += len(rows)
+                batch += 1
+                if batch % self.checkpoint_every == 0:
+                    self.write_checkpoint(output)
+                self.report(batch, len(rows), time.perf_counter() - start)
+            self.write_checkpoint(output)
+        return self.rows
+
+    def calculate(self, key, inputs):
+        """Returns the JSON line of results for one row."""
+        result = dict(key=encode_key(key))
+        try:
+            dating = PregnancyDating(**inputs)
+        except UltrasoundError as e:
+            result.update(error=str(e))
+        else:
+            result.update(
+                edd=dating.edd.isoformat() if dating.edd else None,
+                edd_method=dating.edd_method,
+                diffdays=dating.diffdays,
+                ga_weeks=dating.ga_weeks,
+                ga_method=dating.ga_method)
+        return json.dumps(result).encode() + b'\n'
+
+    def report(self, batch, rows, seconds):
+        stats = BatchStats(batch, rows, seconds, rows / seconds if seconds else None)
+        self.batches.append(stats)
+        if self.on_batch:
+            self.on_batch(stats)
+
+    def read_checkpoint(self):
+        try:
+            with open(self.checkpoint_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return dict(last_key=None, rows=0, offset=0)
+
+    def write_checkpoint(self, output):
+        """Flushes the output to disk then atomically replaces the checkpoint."""
+        output.flush()
+        os.fsync(output.fileno())
+        path = '{}.tmp'.format(self.checkpoint_path)
+        with open(path, 'w') as f:
+            json.dump(dict(last_key=self.last_key, rows=self.rows, offset=output.tell()), f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path, self.checkpoint_path)
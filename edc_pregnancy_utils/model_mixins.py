@@ -1,9 +1,10 @@
+from collections import namedtuple
 from uuid import uuid4
 
 from django.apps import apps as django_apps
-from django.core.exceptions import ValidationError
+from django.core.exceptions import ImproperlyConfigured, ValidationError
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.db.models import options
 from django.utils import timezone
 
@@ -15,8 +16,27 @@ from edc_identifier.model_mixins import UniqueSubjectIdentifierFieldMixin
 from edc_protocol.validators import datetime_not_before_study_start
 from edc_registration.model_mixins import UpdatesOrCreatesRegistrationModelMixin
 
+from .allocators import get_allocator
 
-options.DEFAULT_NAMES = options.DEFAULT_NAMES + ('delivery_model', 'birth_model')
+
+options.DEFAULT_NAMES = options.DEFAULT_NAMES + (
+    'delivery_model', 'birth_model', 'infant_sequence_model')
+
+Infant = namedtuple('Infant', 'identifier birth_order')
+
+
+class InfantSequenceModelMixin(models.Model):
+
+    """A model mixin for the per-site counter of infant sequence numbers.
+
+    See InfantIdentifierBlockModelMixin and allocators.py."""
+
+    study_site = models.CharField(max_length=10, unique=True)
+
+    next_sequence = models.IntegerField(default=1)
+
+    class Meta:
+        abstract = True
 
 
 class BirthModelManager(models.Manager):
@@ -71,25 +91,46 @@ class LabourAndDeliveryModelMixin(models.Model):
         max_length=3,
         choices=YES_NO)
 
+    maternal_identifier_cls = MaternalIdentifier
+
+    infant_identifier_attempts = 3
+
     def save(self, *args, **kwargs):
         if not self.id:
-            maternal_identifier = MaternalIdentifier(
-                identifier=self.subject_identifier)
-            maternal_identifier.deliver(
-                self.live_infants,
-                model=self._meta.birth_model,
-                subject_type_name=self.subject_type,
-                study_site=self.study_site,
-                birth_orders=self.birth_orders,
-                create_registration=True)
+            self.allocate_infant_identifiers()
         super(LabourAndDeliveryModelMixin, self).save(*args, **kwargs)
 
+    def allocate_infant_identifiers(self):
+        """Allocates the infant identifiers and registrations for this delivery.
+
+        Each attempt runs in its own savepoint so an IntegrityError raised when
+        a concurrent delivery takes the same identifier rolls back only that
+        attempt before retrying. Set `maternal_identifier_cls` to allocate
+        with another strategy or see InfantIdentifierBlockModelMixin."""
+        for attempt in range(1, self.infant_identifier_attempts + 1):
+            try:
+                with transaction.atomic():
+                    maternal_identifier = self.maternal_identifier_cls(
+                        identifier=self.subject_identifier)
+                    maternal_identifier.deliver(
+                        self.live_infants,
+                        model=self._meta.birth_model,
+                        subject_type_name=self.subject_type,
+                        study_site=self.study_site,
+                        birth_orders=self.birth_orders,
+                        create_registration=True)
+            except IntegrityError:
+                if attempt == self.infant_identifier_attempts:
+                    raise
+            else:
+                return maternal_identifier
+
     @property
     def infants(self):
         """Returns a list of infant identifiers ordered by birth order."""
         infants = []
         if self.subject_identifier:
-            maternal_identifier = MaternalIdentifier(
+            maternal_identifier = self.maternal_identifier_cls(
                 identifier=self.subject_identifier)
             infants = maternal_identifier.infants
         return infants
@@ -100,6 +141,118 @@ class LabourAndDeliveryModelMixin(models.Model):
         consent_model = None
 
 
+def luhn_check_digit(digits):
+    """Returns the Luhn check digit of a string of digits."""
+    total = 0
+    for index, digit in enumerate(reversed(digits)):
+        digit = int(digit) * (1 if index % 2 else 2)
+        total += digit - 9 if digit > 9 else digit
+    return str(-total % 10)
+
+
+class InfantIdentifierBlockModelMixin(models.Model):
+
+    """A Labour and Delivery model mixin to allocate infant identifiers from
+    blocks of per-site sequence numbers, see allocators.py.
+
+    Declare it before LabourAndDeliveryModelMixin and set Meta.infant_sequence_model
+    to the label of a concrete model of InfantSequenceModelMixin. For example:
+
+        class MaternalLabDel(InfantIdentifierBlockModelMixin, LabourAndDeliveryModelMixin,
+                             BaseUuidModel):
+
+            class Meta(LabourAndDeliveryModelMixin.Meta):
+                birth_model = 'example.maternallabdelbirth'
+                infant_sequence_model = 'example.infantsequence'
+
+    Unlike MaternalIdentifier.deliver, the identifier suffix is the next
+    sequence number of the study site and a Luhn check digit instead of a
+    code for the birth order and number of live infants, e.g. 000-40990001-6-001271
+    instead of 000-40990001-6-25. The identifiers are kept in birth order in
+    `infant_identifiers`. Infants in `birth_orders` are registered with the
+    mother as relative as with MaternalIdentifier, but with a first name of
+    Baby<birth_order> as the delivery has no last name. An invalid
+    `birth_orders` raises ValidationError.
+
+    Blocks are reserved on `infant_sequence_database`, by default a second
+    connection to the database of the sequence model."""
+
+    infant_identifiers = models.CharField(
+        max_length=250,
+        null=True,
+        editable=False,
+        help_text='Infant identifiers in birth order.')
+
+    infant_identifier_template = '{maternal_identifier}-{sequence:05d}{check_digit}'
+
+    infant_sequence_block_size = 100
+
+    infant_sequence_database = None
+
+    infant_subject_type = 'infant'
+
+    def allocate_infant_identifiers(self):
+        """Allocates the infant identifiers from the study site's block of
+        sequence numbers and registers the infants in `birth_orders`.
+
+        Returns the identifiers in birth order."""
+        birth_orders = self.get_birth_orders()
+        if not getattr(self._meta, 'infant_sequence_model', None):
+            raise ImproperlyConfigured(
+                'Invalid Meta.infant_sequence_model. Expected a model label. Got None.')
+        model = django_apps.get_model(*self._meta.infant_sequence_model.split('.'))
+        allocator = get_allocator(
+            model, block_size=self.infant_sequence_block_size,
+            using=self.infant_sequence_database)
+        identifiers = []
+        for sequence in allocator.allocate(self.study_site, self.live_infants):
+            identifier = self.infant_identifier_template.format(
+                maternal_identifier=self.subject_identifier, sequence=sequence,
+                check_digit='')
+            identifiers.append(self.infant_identifier_template.format(
+                maternal_identifier=self.subject_identifier, sequence=sequence,
+                check_digit=luhn_check_digit(''.join(c for c in identifier if c.isdigit()))))
+        self.infant_identifiers = ','.join(identifiers)
+        RegisteredSubject = django_apps.get_app_config('edc_registration').model
+        for birth_order in birth_orders:
+            RegisteredSubject.objects.create(
+                subject_identifier=identifiers[birth_order - 1],
+                subject_type=self.infant_subject_type,
+                relative_identifier=self.subject_identifier,
+                first_name='Baby{}'.format(birth_order),
+                registration_status='DELIVERED',
+                registration_datetime=self.delivery_datetime)
+        return identifiers
+
+    def get_birth_orders(self):
+        """Returns the birth orders to register, all if `birth_orders` is blank."""
+        if not self.birth_orders:
+            return list(range(1, self.live_infants + 1))
+        try:
+            birth_orders = [int(birth_order) for birth_order in self.birth_orders.split(',')]
+        except ValueError:
+            birth_orders = []
+        if (not birth_orders or len(set(birth_orders)) != len(birth_orders)
+                or not all(1 <= birth_order <= self.live_infants
+                           for birth_order in birth_orders)):
+            raise ValidationError(
+                'Invalid birth_orders. Expected distinct birth orders from 1 to {} '
+                'separated by commas. Got {}.'.format(self.live_infants, self.birth_orders))
+        return birth_orders
+
+    @property
+    def infants(self):
+        """Returns a list of infant identifiers ordered by birth order."""
+        if self.infant_identifiers:
+            return [
+                Infant(identifier, birth_order) for birth_order, identifier in enumerate(
+                    self.infant_identifiers.split(','), start=1)]
+        return super(InfantIdentifierBlockModelMixin, self).infants
+
+    class Meta:
+        abstract = True
+
+
 class BirthModelMixin(UniqueSubjectIdentifierFieldMixin, UpdatesOrCreatesRegistrationModelMixin, models.Model):
 
     delivery_reference = models.UUIDField()
@@ -140,8 +293,7 @@ class BirthModelMixin(UniqueSubjectIdentifierFieldMixin, UpdatesOrCreatesRegistr
     def save(self, *args, **kwargs):
         delivery_model = django_apps.get_model(*self._meta.delivery_model.split('.'))
         delivery = delivery_model.objects.get(reference=self.delivery_reference)
-        maternal_identifier = MaternalIdentifier(identifier=delivery.subject_identifier)
-        self.subject_identifier = maternal_identifier.infants[self.birth_order - 1].identifier
+        self.subject_identifier = delivery.infants[self.birth_order - 1].identifier
         if not self.first_name:
             RegisteredSubject = django_apps.get_app_config('edc_registration').model
             obj = RegisteredSubject.objects.get(subject_identifier=self.subject_identifier)
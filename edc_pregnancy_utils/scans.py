@@ -0,0 +1,88 @@
+"""Selection of the dating scan from a pregnancy's ultrasound history.
+
+`select_dating_scan` picks the scan for one pregnancy and
+`select_dating_scans` does the same for a whole cohort of scans keyed by
+participant. Neither creates Ultrasound objects nor raises for invalid
+scans; a scan that Ultrasound would reject is skipped.
+"""
+from collections import namedtuple
+
+from .constants import ULTRASOUND_OK
+from .dating import ultrasound_status
+
+EARLIEST = 'earliest'
+LATEST = 'latest'
+
+DatingScans = namedtuple(
+    'DatingScans',
+    'keys index valid_scans ultrasound_date ga_confirmed_weeks ga_confirmed_days '
+    'ultrasound_edd')
+
+
+def _validate_select(select):
+    if select not in (EARLIEST, LATEST):
+        raise ValueError(
+            'Invalid select. Expected one of {}. Got {}.'.format((EARLIEST, LATEST), select))
+
+
+def select_dating_scan(scans, select=EARLIEST):
+    """Returns the earliest (or latest) valid scan from an iterable of dicts
+    of Ultrasound arguments, or None if there is no valid scan.
+
+    The selected dict can be passed to PregnancyDating as is, e.g.
+    `PregnancyDating(lmp=lmp, reference_date=reference_date, **scan)`."""
+    _validate_select(select)
+    selected = selected_date = None
+    for scan in scans:
+        ultrasound_date = scan.get('ultrasound_date')
+        ultrasound_edd = scan.get('ultrasound_edd')
+        weeks = scan.get('ga_confirmed_weeks')
+        if not ultrasound_date or not ultrasound_edd or weeks is None:
+            continue
+        ordinal = ultrasound_date.toordinal()
+        status = ultrasound_status(
+            ordinal, ultrasound_edd.toordinal(), weeks, scan.get('ga_confirmed_days') or 0)
+        if status != ULTRASOUND_OK:
+            continue
+        if (selected is None or (select == EARLIEST and ordinal < selected_date)
+                or (select == LATEST and ordinal > selected_date)):
+            selected, selected_date = scan, ordinal
+    return selected
+
+
+def select_dating_scans(keys, ultrasound_date, ga_confirmed_weeks, ga_confirmed_days,
+                        ultrasound_edd, select=EARLIEST):
+    """Returns a DatingScans of the earliest (or latest) valid scan per key.
+
+    Arguments other than `keys` are vectorized.Column as for vectorized.ultrasound.
+    The result is one row per unique key, in sorted key order, with `index` into
+    the input scans (-1 if the key has no valid scan), the number of valid scans
+    and the selected scan's columns, masked where there is none. These can be
+    passed to vectorized.dating with LMP columns aligned to `keys`. Ties on date
+    select the first scan in input order."""
+    _validate_select(select)
+    import numpy as np
+
+    from . import vectorized
+
+    keys = np.asarray(keys)
+    _, status = vectorized.ultrasound(
+        ultrasound_date, ga_confirmed_weeks, ga_confirmed_days, ultrasound_edd)
+    unique_keys, key_index = np.unique(keys, return_inverse=True)
+    valid = np.flatnonzero(status == ULTRASOUND_OK)
+    dates = ultrasound_date.values[valid]
+    order = np.lexsort((valid, dates if select == EARLIEST else -dates, key_index[valid]))
+    candidates = valid[order]
+    groups, first = np.unique(key_index[candidates], return_index=True)
+    index = np.full(len(unique_keys), -1, dtype=np.int64)
+    index[groups] = candidates[first]
+    valid_scans = np.bincount(key_index[valid], minlength=len(unique_keys))
+    mask = index >= 0
+    take = np.where(mask, index, 0)
+
+    def selected(column):
+        return vectorized.column(column.values[take], mask & column.mask[take])
+
+    return DatingScans(
+        unique_keys, index, valid_scans, selected(ultrasound_date),
+        selected(ga_confirmed_weeks), selected(ga_confirmed_days), selected(ultrasound_edd))
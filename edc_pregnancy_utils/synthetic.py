@@ -0,0 +1,56 @@
+"""A seeded, vectorized generator of synthetic pregnancy cohorts.
+
+    columns = synthetic_cohort(1_000_000, seed=1)
+    result = vectorized.dating(*[columns[name] for name in FIELDS])
+
+or write the columns to a cohort file with `CohortWriter.write(**columns)`.
+"""
+from datetime import date
+
+import numpy as np
+
+from . import vectorized
+from .cohort import FIELDS
+
+
+def synthetic_cohort(size, seed=None, start=date(2016, 1, 1), end=date(2018, 12, 31),
+                     missing_lmp=0.1, missing_ultrasound=0.4, missing_ga_days=0.05,
+                     invalid_ga=0.01, edd_mismatch=0.01):
+    """Returns a dict of vectorized.Column for `size` rows keyed by FIELDS.
+
+    Dates are `date.toordinal()` day numbers with reference dates between
+    `start` and `end`. LMP dates carry a recall error against the true GA and
+    ultrasounds a scan error, so the LMP and ultrasound EDDs disagree as in real
+    data. Ultrasounds pass Ultrasound validation except for the `invalid_ga` rate
+    of GA weeks out of range and the `edd_mismatch` rate of ultrasound EDDs that
+    do not match the confirmed GA. The `missing_*` rates are of rows with no LMP,
+    no ultrasound or no GA days."""
+    rng = np.random.default_rng(seed)
+    reference_date = rng.integers(start.toordinal(), end.toordinal() + 1, size)
+    true_ga = rng.integers(10 * 7, 40 * 7, size)
+    lmp = reference_date - true_ga + np.rint(rng.normal(0, 7, size)).astype(np.int64)
+
+    ultrasound_date = reference_date - rng.integers(0, 29, size)
+    ultrasound_ga = true_ga - (reference_date - ultrasound_date)
+    ultrasound_ga = ultrasound_ga + np.rint(rng.normal(0, 4, size)).astype(np.int64)
+    ultrasound_ga = np.clip(ultrasound_ga, 7, 39 * 7 + 6)
+    ga_weeks, ga_days = np.divmod(ultrasound_ga, 7)
+    ultrasound_edd = ultrasound_date + 280 - ultrasound_ga
+
+    invalid = rng.random(size) < invalid_ga
+    ga_weeks = np.where(invalid, rng.choice([0, 40, 41, 42], size), ga_weeks)
+    mismatch = rng.random(size) < edd_mismatch
+    shift = rng.integers(7, 22, size) * rng.choice([-1, 1], size)
+    ultrasound_edd = np.where(mismatch, ultrasound_edd + shift, ultrasound_edd)
+
+    lmp_mask = rng.random(size) >= missing_lmp
+    ultrasound_mask = rng.random(size) >= missing_ultrasound
+    ga_days_mask = ultrasound_mask & (rng.random(size) >= missing_ga_days)
+    columns = dict(
+        lmp=vectorized.column(lmp, lmp_mask),
+        reference_date=vectorized.column(reference_date),
+        ultrasound_date=vectorized.column(ultrasound_date, ultrasound_mask),
+        ga_confirmed_weeks=vectorized.column(ga_weeks, ultrasound_mask),
+        ga_confirmed_days=vectorized.column(ga_days, ga_days_mask),
+        ultrasound_edd=vectorized.column(ultrasound_edd, ultrasound_mask))
+    return {name: columns[name] for name in FIELDS}
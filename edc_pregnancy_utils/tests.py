@@ -1,22 +1,65 @@
+import json
+import multiprocessing
+import os
+import tempfile
 import unittest
+import uuid
 
 from datetime import datetime, date
 from dateutil.relativedelta import relativedelta
 from faker import Faker
 
 from django.apps import apps as django_apps
-from django.test.testcases import TestCase
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, connection, connections, models, transaction
+from django.test.client import Client
+from django.test.testcases import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
 
+from edc_constants.constants import NO
 from edc_identifier.maternal_identifier import MaternalIdentifier
 from edc_base_test.faker import EdcBaseProvider
 from edc_base.utils import get_utcnow
 
-from .constants import ULTRASOUND, LMP
+from .constants import (
+    ULTRASOUND, LMP, ULTRASOUND_OK, ULTRASOUND_MISSING, ULTRASOUND_INVALID_WEEKS)
+from . import allocators
+from .allocators import InfantSequenceAllocator, sequence_database
+from .dating import PregnancyDating
+from .executor import DatingExecutor
+from .jobs import CheckpointError, RecomputationJob
+from .scans import LATEST, select_dating_scan, select_dating_scans
+from .views import NDJSON
 from .edd import Edd
 from .ga import Ga
 from .lmp import Lmp
+from .model_mixins import (
+    BirthModelMixin, InfantIdentifierBlockModelMixin, InfantSequenceModelMixin,
+    LabourAndDeliveryModelMixin)
 from .ultrasound import Ultrasound, UltrasoundError
 
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+else:
+    from . import accessors  # noqa
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+else:
+    from . import arrow
+try:
+    from . import vectorized
+except ImportError:
+    vectorized = None
+else:
+    from .cohort import CohortFileError, CohortWriter, FIELDS, RECORD_DTYPE, read_cohort
+    from .synthetic import synthetic_cohort
+
 fake = Faker()
 fake.add_provider(EdcBaseProvider)
 
@@ -59,6 +102,200 @@ class TestModel(TestCase):
             self.fail('RegisteredSubject.DoesNotExist unexpectedly raised')
 
 
+class FlakyMaternalIdentifier:
+    """A MaternalIdentifier that fails to deliver `failures` times."""
+
+    failures = 0
+    attempts = 0
+
+    def __init__(self, identifier=None):
+        self.identifier = identifier
+        self.infants = []
+
+    def deliver(self, live_infants, **kwargs):
+        FlakyMaternalIdentifier.attempts += 1
+        if FlakyMaternalIdentifier.attempts <= FlakyMaternalIdentifier.failures:
+            raise IntegrityError('duplicate identifier')
+        self.infants = list(range(live_infants))
+
+
+class TestInfantIdentifierAllocation(TestCase):
+
+    def setUp(self):
+        FlakyMaternalIdentifier.attempts = 0
+        model = django_apps.get_model('edc_example', 'maternallabdel')
+        self.delivery = model(subject_identifier='000-40990001-6', live_infants=2)
+        self.delivery.maternal_identifier_cls = FlakyMaternalIdentifier
+
+    def test_allocate_retries_integrity_error(self):
+        """Assert an IntegrityError from a concurrent delivery is retried."""
+        FlakyMaternalIdentifier.failures = 1
+        maternal_identifier = self.delivery.allocate_infant_identifiers()
+        self.assertEqual(FlakyMaternalIdentifier.attempts, 2)
+        self.assertEqual(len(maternal_identifier.infants), 2)
+
+    def test_allocate_raises_after_attempts(self):
+        """Assert IntegrityError is raised once all attempts fail."""
+        FlakyMaternalIdentifier.failures = 10
+        self.assertRaises(IntegrityError, self.delivery.allocate_infant_identifiers)
+        self.assertEqual(
+            FlakyMaternalIdentifier.attempts, self.delivery.infant_identifier_attempts)
+
+
+class InfantSequence(InfantSequenceModelMixin):
+
+    class Meta:
+        app_label = 'edc_example'
+
+
+class BlockLabourAndDelivery(InfantIdentifierBlockModelMixin, LabourAndDeliveryModelMixin):
+
+    subject_identifier = models.CharField(max_length=50)
+
+    subject_type = 'maternal'
+
+    @property
+    def study_site(self):
+        return self.subject_identifier[4:6]
+
+    class Meta(LabourAndDeliveryModelMixin.Meta):
+        app_label = 'edc_example'
+        birth_model = 'edc_example.blockbirth'
+        infant_sequence_model = 'edc_example.infantsequence'
+
+
+class BlockBirth(BirthModelMixin):
+
+    class Meta(BirthModelMixin.Meta):
+        app_label = 'edc_example'
+        delivery_model = 'edc_example.blocklabouranddelivery'
+
+
+def allocate_in_process(block_size, allocations):
+    """Returns the sequence numbers allocated by a new process, two at a time."""
+    allocator = InfantSequenceAllocator(InfantSequence, block_size=block_size)
+    sequences = []
+    for _ in range(allocations):
+        sequences.extend(allocator.allocate('40', 2))
+    connections.close_all()
+    return sequences
+
+
+class TestInfantSequenceAllocator(TransactionTestCase):
+
+    databases = '__all__'
+
+    models = [InfantSequence, BlockLabourAndDelivery, BlockBirth]
+
+    @classmethod
+    def setUpClass(cls):
+        cls.sequence_database = sequence_database(connection.alias)
+        super().setUpClass()
+        with connection.schema_editor() as editor:
+            for model in cls.models:
+                editor.create_model(model)
+
+    @classmethod
+    def tearDownClass(cls):
+        with connection.schema_editor() as editor:
+            for model in cls.models:
+                editor.delete_model(model)
+        connections[cls.sequence_database].close()
+        super().tearDownClass()
+
+    def setUp(self):
+        allocators._allocators.clear()
+        InfantSequence.objects.all().delete()
+
+    def deliver(self, live_infants=2, birth_orders=None):
+        return BlockLabourAndDelivery.objects.create(
+            subject_identifier='000-40990001-6',
+            live_infants=live_infants,
+            live_infants_to_register=live_infants,
+            birth_orders=birth_orders,
+            delivery_datetime=get_utcnow(),
+            delivery_time_estimated=NO)
+
+    def test_allocate_from_block(self):
+        """Assert numbers are handed out from a reserved block per site."""
+        allocator = InfantSequenceAllocator(InfantSequence, block_size=10)
+        self.assertEqual(allocator.allocate('40', 3), [1, 2, 3])
+        self.assertEqual(allocator.allocate('40', 2), [4, 5])
+        self.assertEqual(InfantSequence.objects.get(study_site='40').next_sequence, 11)
+        self.assertEqual(allocator.allocate('41'), [1])
+        self.assertEqual(allocator.allocate('40', 6), [11, 12, 13, 14, 15, 16])
+        self.assertEqual(InfantSequence.objects.get(study_site='40').next_sequence, 21)
+
+    def test_allocate_in_transaction(self):
+        """Assert only the numbers needed are reserved if the reserving connection
+        is in a transaction."""
+        allocator = InfantSequenceAllocator(
+            InfantSequence, block_size=10, using=connection.alias)
+        with transaction.atomic():
+            self.assertEqual(allocator.allocate('40', 2), [1, 2])
+        self.assertEqual(InfantSequence.objects.get(study_site='40').next_sequence, 3)
+        self.assertEqual(allocator.blocks, {})
+
+    def test_delivery_and_birth(self):
+        """Assert a delivery allocates from a block and registers the infants in
+        birth_orders, and a birth takes its identifier and first name."""
+        RegisteredSubject = django_apps.get_app_config('edc_registration').model
+        delivery = self.deliver(birth_orders='2')
+        self.assertEqual(
+            [infant.identifier for infant in delivery.infants],
+            ['000-40990001-6-000018', '000-40990001-6-000026'])
+        registered_subject = RegisteredSubject.objects.get(
+            relative_identifier='000-40990001-6')
+        self.assertEqual(registered_subject.subject_identifier, '000-40990001-6-000026')
+        self.assertEqual(registered_subject.subject_type, 'infant')
+        self.assertEqual(registered_subject.first_name, 'Baby2')
+        birth = BlockBirth.objects.create(
+            delivery_reference=delivery.reference,
+            birth_order=2,
+            birth_order_denominator=2,
+            dob=timezone.localtime(delivery.delivery_datetime).date(),
+            gender='F')
+        self.assertEqual(birth.subject_identifier, '000-40990001-6-000026')
+        self.assertEqual(str(birth), 'Baby2 () F 2/2')
+
+    def test_invalid_birth_orders(self):
+        """Assert a ValidationError is raised before allocating for invalid birth_orders."""
+        for birth_orders in ['3', '0', '1,1', '1;2']:
+            with self.subTest(birth_orders=birth_orders):
+                self.assertRaises(
+                    ValidationError, self.deliver, birth_orders=birth_orders)
+        self.assertFalse(InfantSequence.objects.exists())
+
+    @unittest.skipUnless(
+        connection.vendor in ['postgresql', 'mysql'], 'Requires a database server.')
+    def test_delivery_in_transaction(self):
+        """Assert a delivery saved in a transaction holds no lock on the counter."""
+        with transaction.atomic():
+            self.deliver()
+            queryset = InfantSequence.objects.using(self.sequence_database)
+            with transaction.atomic(using=self.sequence_database):
+                counter = queryset.select_for_update(nowait=True).get(study_site='40')
+            self.assertEqual(
+                counter.next_sequence, BlockLabourAndDelivery.infant_sequence_block_size + 1)
+
+    @unittest.skipUnless(
+        connection.vendor in ['postgresql', 'mysql'], 'Requires a database server.')
+    def test_concurrent_processes(self):
+        """Assert processes allocating at once get no duplicates. See
+        tools/benchmark_allocator.py for throughput."""
+        allocations = 200
+        for block_size in [1, 50]:
+            for processes in [1, 4]:
+                InfantSequence.objects.all().delete()
+                connections.close_all()
+                with multiprocessing.get_context('fork').Pool(processes) as pool:
+                    results = pool.starmap(
+                        allocate_in_process, [(block_size, allocations)] * processes)
+                sequences = [sequence for result in results for sequence in result]
+                self.assertEqual(len(sequences), processes * allocations * 2)
+                self.assertEqual(len(set(sequences)), len(sequences))
+
+
 class TestLmp(unittest.TestCase):
 
     def test_lmp_none(self):
@@ -277,6 +514,18 @@ class TestGa(unittest.TestCase):
         self.assertEqual(ga.weeks, 23)
         self.assertEqual(ga.method, LMP)
 
+    def test_ga_handles_none(self):
+        """Assert Ga handles None for lmp and ultrasound in either preference."""
+        for prefer_ultrasound in [True, False]:
+            ga = Ga(None, None, prefer_ultrasound=prefer_ultrasound)
+            self.assertIsNone(ga.ga)
+            self.assertIsNone(ga.weeks)
+        dt = get_utcnow()
+        lmp = Lmp(lmp=dt - relativedelta(weeks=25), reference_date=dt)
+        ga = Ga(lmp, None, prefer_ultrasound=False)
+        self.assertEqual(ga.weeks, 25)
+        self.assertEqual(ga.method, LMP)
+
 
 class TestEdd(unittest.TestCase):
 
@@ -388,3 +637,500 @@ class TestEddFunctional(unittest.TestCase):
                 self.assertEqual(
                     edd.edd, getattr(self, edd_attr),
                     msg=str([ga_ultrasound, delta, diffdays, edd_attr, edd_method]))
+
+
+class DatingRowsMixin:
+    """Rows of (lmp, reference_date, ultrasound_date, ga_confirmed_weeks,
+    ga_confirmed_days, ultrasound_edd) and what the classes return for them."""
+
+    def setUp(self):
+        reference_date = date(2016, 10, 15)
+        self.rows = [
+            (None, None, None, None, None, None),
+            (reference_date - relativedelta(weeks=21), reference_date, None, None, None, None),
+            (None, None, reference_date, 25, 3, reference_date + relativedelta(weeks=40 - 25)),
+            (reference_date - relativedelta(weeks=18), reference_date, reference_date, 22,
+             None, reference_date + relativedelta(weeks=40 - 22)),
+            (reference_date - relativedelta(weeks=21), reference_date, reference_date, 22,
+             None, reference_date + relativedelta(weeks=40 - 22)),
+            (reference_date - relativedelta(weeks=30), reference_date, reference_date, 30, 2,
+             reference_date + relativedelta(weeks=40 - 30)),
+            (reference_date - relativedelta(weeks=10), reference_date, reference_date, 10, 1,
+             reference_date + relativedelta(weeks=40 - 10)),
+            (reference_date - relativedelta(weeks=21), reference_date, reference_date, 0, 0,
+             reference_date + relativedelta(weeks=40)),
+        ]
+        self.expected = []
+        for lmp_date, reference_date, *ultrasound_values in self.rows:
+            try:
+                ultrasound = Ultrasound(*ultrasound_values)
+            except UltrasoundError:
+                ultrasound = Ultrasound()
+            lmp = Lmp(lmp=lmp_date, reference_date=reference_date)
+            edd = Edd(lmp=lmp, ultrasound=ultrasound)
+            ga = Ga(lmp, ultrasound)
+            ga_lmp = Ga(lmp, ultrasound, prefer_ultrasound=False)
+            self.expected.append((
+                edd.edd, edd.method, edd.diffdays, ga.weeks, ga.method, ga_lmp.weeks,
+                ga_lmp.method))
+
+    def columns(self):
+        columns = []
+        for index, values in enumerate(zip(*self.rows)):
+            if index in (3, 4):
+                columns.append(vectorized.column(
+                    [v or 0 for v in values], [v is not None for v in values]))
+            else:
+                columns.append(vectorized.column(
+                    [v.toordinal() if v else 0 for v in values],
+                    [v is not None for v in values]))
+        return columns
+
+
+class TestPregnancyDating(DatingRowsMixin, unittest.TestCase):
+
+    def test_matches_classes(self):
+        """Assert PregnancyDating returns what Edd and Ga return for each row."""
+        for index, (row, expected) in enumerate(zip(self.rows[:7], self.expected)):
+            dating = PregnancyDating(*row)
+            got = (
+                dating.edd, dating.edd_method, dating.diffdays, dating.ga_weeks,
+                dating.ga_method, dating.ga_weeks_lmp_preferred,
+                dating.ga_method_lmp_preferred)
+            self.assertEqual(got, expected, msg='row {}'.format(index))
+
+    def test_ga_is_relativedelta(self):
+        """Assert PregnancyDating.ga equals Ga.ga."""
+        row = self.rows[5]
+        lmp = Lmp(lmp=row[0], reference_date=row[1])
+        ultrasound = Ultrasound(*row[2:])
+        dating = PregnancyDating(*row)
+        self.assertEqual(dating.ga, Ga(lmp, ultrasound).ga)
+        self.assertEqual(
+            dating.ga_lmp_preferred, Ga(lmp, ultrasound, prefer_ultrasound=False).ga)
+
+    def test_invalid_ultrasound_raises(self):
+        """Assert PregnancyDating raises UltrasoundError as does Ultrasound."""
+        self.assertRaises(UltrasoundError, PregnancyDating, *self.rows[7])
+
+
+class TestDatingExecutor(DatingRowsMixin, unittest.TestCase):
+
+    def test_map(self):
+        """Assert results are returned in order across threads with errors in place."""
+        records = [dict(zip(
+            ['lmp', 'reference_date', 'ultrasound_date', 'ga_confirmed_weeks',
+             'ga_confirmed_days', 'ultrasound_edd'], row)) for row in self.rows] * 10
+        with DatingExecutor(max_workers=4, chunk_size=3) as executor:
+            results = executor.map(records)
+        self.assertEqual(len(results), len(records))
+        for index, result in enumerate(results):
+            if index % len(self.rows) == 7:
+                self.assertIsInstance(result, UltrasoundError)
+            else:
+                self.assertEqual(
+                    (result.edd, result.edd_method, result.diffdays),
+                    self.expected[index % len(self.rows)][:3])
+
+
+@unittest.skipIf(vectorized is None, 'numpy not installed')
+class TestVectorized(DatingRowsMixin, unittest.TestCase):
+
+    def test_dating_matches_classes(self):
+        """Assert vectorized.dating returns what Edd and Ga return for each row."""
+        result = vectorized.dating(*self.columns())
+        result_lmp = vectorized.dating(*self.columns(), prefer_ultrasound=False)
+        for index, expected in enumerate(self.expected):
+            got = (
+                date.fromordinal(result['edd'][index]) if result['edd_mask'][index] else None,
+                result['edd_method'][index] if result['edd_method_mask'][index] else None,
+                result['edd_diffdays'][index] if result['edd_diffdays_mask'][index] else None,
+                result['ga_weeks'][index] if result['ga_weeks_mask'][index] else None,
+                result['ga_method'][index] if result['ga_method_mask'][index] else None,
+                result_lmp['ga_weeks'][index] if result_lmp['ga_weeks_mask'][index] else None,
+                (result_lmp['ga_method'][index]
+                 if result_lmp['ga_method_mask'][index] else None))
+            self.assertEqual(got, expected, msg='row {}'.format(index))
+
+    def test_ultrasound_status(self):
+        """Assert an invalid ultrasound is flagged instead of raised."""
+        result = vectorized.dating(*self.columns())
+        self.assertEqual(result['ultrasound_status'][2], ULTRASOUND_OK)
+        self.assertEqual(result['ultrasound_status'][7], ULTRASOUND_INVALID_WEEKS)
+
+
+@unittest.skipIf(pd is None, 'pandas not installed')
+class TestPregnancyAccessor(DatingRowsMixin, unittest.TestCase):
+
+    def dataframe(self):
+        df = pd.DataFrame(self.rows, columns=[
+            'lmp', 'reference_date', 'ultrasound_date', 'ga_confirmed_weeks',
+            'ga_confirmed_days', 'ultrasound_edd'])
+        for name in ['lmp', 'reference_date', 'ultrasound_date', 'ultrasound_edd']:
+            df[name] = pd.to_datetime(df[name])
+        return df
+
+    def test_edd_and_ga(self):
+        """Assert the accessor returns what Edd and Ga return for each row, nulls as NA."""
+        df = self.dataframe()
+        options = dict(
+            ultrasound_date='ultrasound_date', ga_confirmed_weeks='ga_confirmed_weeks',
+            ga_confirmed_days='ga_confirmed_days', ultrasound_edd='ultrasound_edd')
+        edd = df.pregnancy.edd(**options)
+        ga = df.pregnancy.ga(**options)
+        ga_lmp = df.pregnancy.ga(prefer_ultrasound=False, **options)
+        for index, expected in enumerate(self.expected):
+            got = [
+                edd['edd'][index], edd['edd_method'][index], edd['edd_diffdays'][index],
+                ga['ga_weeks'][index], ga['ga_method'][index],
+                ga_lmp['ga_weeks'][index], ga_lmp['ga_method'][index]]
+            got = [None if pd.isna(value) else value for value in got]
+            got[0] = got[0] if got[0] is None else got[0].date()
+            self.assertEqual(tuple(got), expected, msg='row {}'.format(index))
+
+    def test_missing_column(self):
+        """Assert a column name not in the DataFrame raises, None is all missing."""
+        df = self.dataframe().drop(columns=['reference_date'])
+        self.assertRaises(KeyError, df.pregnancy.edd)
+        edd = df.pregnancy.edd(reference_date=None)
+        self.assertTrue(edd['edd'].isna().all())
+
+
+@unittest.skipIf(pa is None, 'pyarrow not installed')
+class TestArrow(DatingRowsMixin, unittest.TestCase):
+
+    def test_edd_and_ga(self):
+        """Assert the arrow functions return what Edd and Ga return for each row."""
+        columns = [
+            pa.array(values, type=pa.int8() if index in (3, 4) else pa.date32())
+            for index, values in enumerate(zip(*self.rows))]
+        edd = arrow.edd(*columns).to_pylist()
+        ga = arrow.ga(*columns).to_pylist()
+        ga_lmp = arrow.ga(*columns, prefer_ultrasound=False).to_pylist()
+        for index, expected in enumerate(self.expected):
+            got = (
+                edd[index]['edd'], edd[index]['edd_method'], edd[index]['edd_diffdays'],
+                ga[index]['ga_weeks'], ga[index]['ga_method'],
+                ga_lmp[index]['ga_weeks'], ga_lmp[index]['ga_method'])
+            self.assertEqual(got, expected, msg='row {}'.format(index))
+
+
+@unittest.skipIf(vectorized is None, 'numpy not installed')
+class TestCohortFile(DatingRowsMixin, unittest.TestCase):
+
+    def test_write_and_read(self):
+        """Assert dating over a memory-mapped cohort file matches the in-memory columns."""
+        columns = self.columns()
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, 'cohort.bin')
+            with CohortWriter(path) as writer:
+                writer.write(*[vectorized.Column(c.values[:3], c.mask[:3]) for c in columns])
+                writer.write(*[vectorized.Column(c.values[3:], c.mask[3:]) for c in columns])
+            cohort = read_cohort(path)
+            self.assertEqual(len(cohort), len(self.rows))
+            self.assertEqual(
+                os.path.getsize(path), 16 + len(self.rows) * RECORD_DTYPE.itemsize)
+            expected = vectorized.dating(*columns)
+            result = cohort.dating()
+            for key, values in expected.items():
+                self.assertEqual(list(result[key]), list(values), msg=key)
+            result = cohort.dating(start=3, stop=5)
+            self.assertEqual(list(result['edd']), list(expected['edd'][3:5]))
+
+    def test_not_a_cohort_file(self):
+        """Assert read_cohort raises for a file with a bad header."""
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, 'cohort.bin')
+            with open(path, 'wb') as f:
+                f.write(b'0' * 32)
+            self.assertRaises(CohortFileError, read_cohort, path)
+
+    def test_exception_leaves_file_invalid(self):
+        """Assert an exception in the with block re-raises and does not finalize the file."""
+        columns = self.columns()
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, 'cohort.bin')
+            with self.assertRaises(ValueError):
+                with CohortWriter(path) as writer:
+                    writer.write(*columns)
+                    raise ValueError('interrupted')
+            self.assertRaises(CohortFileError, read_cohort, path)
+
+
+class TestRecomputationJob(DatingRowsMixin, unittest.TestCase):
+
+    def fetch(self, after_key, limit):
+        keys = [key for key in range(len(self.rows)) if after_key is None or key > after_key]
+        return [(key, dict(zip(self.fields, self.rows[key]))) for key in keys[:limit]]
+
+    def setUp(self):
+        super().setUp()
+        self.fields = [
+            'lmp', 'reference_date', 'ultrasound_date', 'ga_confirmed_weeks',
+            'ga_confirmed_days', 'ultrasound_edd']
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+
+    def test_run(self):
+        """Assert the job outputs a line per row with per-row errors."""
+        path = os.path.join(self.folder.name, 'dating.ndjson')
+        job = RecomputationJob(self.fetch, path, batch_size=3)
+        self.assertEqual(job.run(), len(self.rows))
+        self.assertEqual(len(job.batches), 3)
+        with open(path) as f:
+            lines = [json.loads(line) for line in f]
+        self.assertEqual([line['key'] for line in lines], list(range(len(self.rows))))
+        self.assertEqual(lines[3]['edd_method'], self.expected[3][1])
+        self.assertIn('error', lines[7])
+
+    def test_resume_after_interruption(self):
+        """Assert an interrupted job resumes after the checkpoint with identical output."""
+        path = os.path.join(self.folder.name, 'expected.ndjson')
+        RecomputationJob(self.fetch, path, batch_size=2).run()
+        with open(path) as f:
+            expected = f.read()
+        calls = []
+
+        def interrupted_fetch(after_key, limit):
+            calls.append(after_key)
+            if len(calls) == 4:
+                raise KeyboardInterrupt
+            return self.fetch(after_key, limit)
+
+        path = os.path.join(self.folder.name, 'dating.ndjson')
+        job = RecomputationJob(interrupted_fetch, path, batch_size=2, checkpoint_every=2)
+        self.assertRaises(KeyboardInterrupt, job.run)
+        job = RecomputationJob(self.fetch, path, batch_size=2)
+        job.run()
+        job.run()
+        with open(path) as f:
+            self.assertEqual(f.read(), expected)
+
+    def test_uuid_keys(self):
+        """Assert UUID keys are output and passed back to fetch as strings."""
+        keys = [uuid.UUID(int=index) for index in range(len(self.rows))]
+        after_keys = []
+
+        def fetch(after_key, limit):
+            after_keys.append(after_key)
+            rows = [(key, dict(zip(self.fields, row))) for key, row in zip(keys, self.rows)
+                    if after_key is None or str(key) > after_key]
+            return rows[:limit]
+
+        path = os.path.join(self.folder.name, 'dating.ndjson')
+        RecomputationJob(fetch, path, batch_size=3).run()
+        with open(path) as f:
+            self.assertEqual([json.loads(line)['key'] for line in f], [str(k) for k in keys])
+        self.assertEqual(after_keys, [None, str(keys[2]), str(keys[5]), str(keys[7])])
+        with open('{}.checkpoint'.format(path)) as f:
+            self.assertEqual(json.load(f)['last_key'], str(keys[-1]))
+
+    def test_output_shorter_than_checkpoint(self):
+        """Assert the job raises rather than resume onto a missing or short output."""
+        path = os.path.join(self.folder.name, 'dating.ndjson')
+        RecomputationJob(self.fetch, path, batch_size=3).run()
+        os.remove(path)
+        self.assertRaises(CheckpointError, RecomputationJob(self.fetch, path).run)
+        self.assertFalse(os.path.exists(path))
+
+
+@unittest.skipIf(vectorized is None, 'numpy not installed')
+class TestSyntheticCohort(unittest.TestCase):
+
+    def test_seeded(self):
+        """Assert the same seed generates the same cohort."""
+        cohort = synthetic_cohort(1000, seed=5)
+        for name, column in synthetic_cohort(1000, seed=5).items():
+            self.assertEqual(list(column.values), list(cohort[name].values))
+            self.assertEqual(list(column.mask), list(cohort[name].mask))
+
+    def test_ultrasounds_validate(self):
+        """Assert only the invalid rows generated are rejected by Ultrasound."""
+        cohort = synthetic_cohort(500, seed=1, invalid_ga=0.1, edd_mismatch=0.1)
+        status = vectorized.dating(*[cohort[name] for name in FIELDS])['ultrasound_status']
+        self.assertGreater(sum(status == ULTRASOUND_OK), 0)
+        self.assertGreater(sum(status > ULTRASOUND_MISSING), 0)
+        for index in range(500):
+            values = []
+            for name in ['ultrasound_date', 'ga_confirmed_weeks', 'ga_confirmed_days',
+                         'ultrasound_edd']:
+                value = int(cohort[name].values[index]) if cohort[name].mask[index] else None
+                if value is not None and name in ['ultrasound_date', 'ultrasound_edd']:
+                    value = date.fromordinal(value)
+                values.append(value)
+            try:
+                Ultrasound(*values)
+            except UltrasoundError:
+                self.assertGreater(status[index], ULTRASOUND_MISSING)
+            else:
+                self.assertLessEqual(status[index], ULTRASOUND_MISSING)
+
+
+class TestBatchDatingView(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('erik')
+        self.client.force_login(self.user)
+
+    def post(self, body, content_type):
+        response = self.client.post(
+            reverse('batch_dating'), data=body, content_type=content_type)
+        return [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+    def test_ndjson(self):
+        """Assert NDJSON records stream back results and per-row errors."""
+        records = [
+            {'key': 'A', 'lmp': '2016-05-21', 'reference_date': '2016-10-15'},
+            {'lmp': '2016-05-21', 'reference_date': '2016-10-15',
+             'ultrasound_date': '2016-10-15', 'ga_confirmed_weeks': 22,
+             'ultrasound_edd': '2017-02-18'},
+            {'ultrasound_date': '2016-10-15', 'ga_confirmed_weeks': 0,
+             'ultrasound_edd': '2017-02-18'}]
+        body = '\n'.join(json.dumps(record) for record in records) + '\n{invalid\n'
+        results = self.post(body, NDJSON)
+        self.assertEqual(
+            results[0],
+            {'key': 'A', 'edd': '2017-02-25', 'edd_method': LMP, 'diffdays': None,
+             'ga_weeks': 21, 'ga_method': LMP})
+        self.assertEqual(results[1]['key'], 1)
+        self.assertEqual(results[1]['diffdays'], 7)
+        self.assertEqual(results[1]['ga_method'], ULTRASOUND)
+        self.assertIn('error', results[2])
+        self.assertIn('error', results[3])
+
+    def test_json_array(self):
+        """Assert a JSON array of records is accepted."""
+        results = self.post(
+            json.dumps([{'lmp': '2016-05-21', 'reference_date': '2016-10-15'}]),
+            'application/json')
+        self.assertEqual(results[0]['edd'], '2017-02-25')
+
+    def test_invalid_records(self):
+        """Assert records that are not objects or have invalid fields return an error."""
+        records = [
+            5,
+            {'lmp': '2016-05-21'},
+            {'ultrasound_date': '2016-10-15', 'ga_confirmed_weeks': True,
+             'ultrasound_edd': '2017-02-18'},
+            {'lmp': 20160521, 'reference_date': '2016-10-15'}]
+        results = self.post(json.dumps(records), 'application/json')
+        self.assertEqual(
+            [result['error'] for result in results],
+            ['Invalid record. Expected an object. Got 5.',
+             'Invalid reference_date. Expected a date with lmp. Got None.',
+             'Invalid ga_confirmed_weeks. Expected an integer. Got True.',
+             'Invalid lmp. Expected an ISO date. Got 20160521.'])
+
+    def test_invalid_keys(self):
+        """Assert a key that is not a string or 64 bit integer is a per-row error."""
+        body = '\n'.join([
+            '{"key": 123456789012345678901234567890, "lmp": "2016-05-21"}',
+            '{"key": true}',
+            '{"key": 9223372036854775807}'])
+        results = self.post(body, NDJSON)
+        self.assertEqual(len(results), 3)
+        self.assertEqual(results[0]['key'], 0)
+        self.assertEqual(
+            results[0]['error'],
+            'Invalid key. Expected a string or a 64 bit integer. '
+            'Got 123456789012345678901234567890.')
+        self.assertEqual(results[1]['key'], 1)
+        self.assertIn('error', results[1])
+        self.assertEqual(results[2]['key'], 9223372036854775807)
+        self.assertNotIn('error', results[2])
+
+    def test_requires_csrf_token(self):
+        """Assert a session-authenticated post without a CSRF token is forbidden."""
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.user)
+        response = client.post(
+            reverse('batch_dating'), data='[]', content_type='application/json')
+        self.assertEqual(response.status_code, 403)
+
+    def test_not_an_array(self):
+        """Assert a JSON body other than an array is a bad request."""
+        response = self.client.post(
+            reverse('batch_dating'), data='{}', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_requires_authentication(self):
+        """Assert an anonymous user is forbidden."""
+        self.client.logout()
+        response = self.client.post(
+            reverse('batch_dating'), data='[]', content_type='application/json')
+        self.assertEqual(response.status_code, 403)
+
+
+class ScanHistoryMixin:
+
+    def setUp(self):
+        scan_date = date(2016, 7, 1)
+        self.scans = [
+            ('A', dict(ultrasound_date=scan_date + relativedelta(weeks=4),
+                       ga_confirmed_weeks=16, ga_confirmed_days=2,
+                       ultrasound_edd=scan_date + relativedelta(weeks=28, days=-2))),
+            ('A', dict(ultrasound_date=scan_date, ga_confirmed_weeks=0, ga_confirmed_days=0,
+                       ultrasound_edd=scan_date + relativedelta(weeks=40))),
+            ('A', dict(ultrasound_date=scan_date + relativedelta(weeks=1),
+                       ga_confirmed_weeks=13, ga_confirmed_days=None,
+                       ultrasound_edd=scan_date + relativedelta(weeks=28))),
+            ('B', dict(ultrasound_date=scan_date, ga_confirmed_weeks=20, ga_confirmed_days=0,
+                       ultrasound_edd=scan_date)),
+            ('C', dict(ultrasound_date=scan_date, ga_confirmed_weeks=30, ga_confirmed_days=1,
+                       ultrasound_edd=scan_date + relativedelta(weeks=10, days=-1))),
+        ]
+
+
+class TestSelectDatingScan(ScanHistoryMixin, unittest.TestCase):
+
+    def test_earliest_valid_scan(self):
+        """Assert the earliest scan that Ultrasound accepts is selected."""
+        scans = [scan for key, scan in self.scans if key == 'A']
+        self.assertIs(select_dating_scan(scans), scans[2])
+        self.assertIs(select_dating_scan(scans, select=LATEST), scans[0])
+        Ultrasound(**select_dating_scan(scans))
+
+    def test_no_valid_scan(self):
+        """Assert None is returned if there is no valid scan."""
+        self.assertIsNone(select_dating_scan([scan for key, scan in self.scans if key == 'B']))
+        self.assertIsNone(select_dating_scan([]))
+
+    def test_invalid_select(self):
+        """Assert an unknown select raises rather than silently selecting the first scan."""
+        scans = [scan for key, scan in self.scans if key == 'A']
+        self.assertRaises(ValueError, select_dating_scan, scans, select='first')
+
+
+@unittest.skipIf(vectorized is None, 'numpy not installed')
+class TestSelectDatingScans(ScanHistoryMixin, unittest.TestCase):
+
+    def column(self, name):
+        values = [scan[name] for _, scan in self.scans]
+        return vectorized.column(
+            [0 if v is None else v if isinstance(v, int) else v.toordinal() for v in values],
+            [v is not None for v in values])
+
+    def test_select_per_key(self):
+        """Assert the earliest valid scan is selected per key and feeds vectorized.dating."""
+        dating_scans = select_dating_scans(
+            [key for key, _ in self.scans], self.column('ultrasound_date'),
+            self.column('ga_confirmed_weeks'), self.column('ga_confirmed_days'),
+            self.column('ultrasound_edd'))
+        self.assertEqual(list(dating_scans.keys), ['A', 'B', 'C'])
+        self.assertEqual(list(dating_scans.index), [2, -1, 4])
+        self.assertEqual(list(dating_scans.valid_scans), [2, 0, 1])
+        self.assertEqual(list(dating_scans.ultrasound_date.mask), [True, False, True])
+        self.assertEqual(list(dating_scans.ga_confirmed_days.mask), [False, False, True])
+        result = vectorized.dating(
+            vectorized.column(None, size=3), vectorized.column(None, size=3),
+            *dating_scans[3:])
+        self.assertEqual(list(result['ga_weeks']), [13, 0, 30])
+        self.assertEqual(list(result['ga_method_mask']), [True, False, True])
+
+    def test_invalid_select(self):
+        """Assert an unknown select raises ValueError."""
+        self.assertRaises(
+            ValueError, select_dating_scans,
+            [key for key, _ in self.scans], self.column('ultrasound_date'),
+            self.column('ga_confirmed_weeks'), self.column('ga_confirmed_days'),
+            self.column('ultrasound_edd'), select='Latest')
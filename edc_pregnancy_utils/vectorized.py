@@ -0,0 +1,153 @@
+"""Array versions of Lmp, Ultrasound, Edd and Ga.
+
+Dates are integer day numbers (e.g. `date.toordinal()` or days since
+1970-01-01 as in Arrow `date32`). Results are returned in the same day
+numbering as the inputs. Each input is a `Column` of values and a boolean
+mask where True means the value is present; a masked-out value is handled
+the same way the classes handle None.
+
+An LMP without a reference date is treated as missing since an Lmp cannot
+be created without one.
+
+Rows that `Ultrasound` would reject with an `UltrasoundError` are not raised,
+they are flagged in the ultrasound status and treated as missing.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from .constants import (
+    LMP, ULTRASOUND, ULTRASOUND_OK, ULTRASOUND_MISSING, ULTRASOUND_INVALID_WEEKS,
+    ULTRASOUND_INVALID_DAYS, ULTRASOUND_GA_MISMATCH)
+
+NO_METHOD = -1
+
+Column = namedtuple('Column', 'values mask')
+
+
+def column(values, mask=None, size=None):
+    """Returns a Column of int64 values with masked-out values set to 0.
+
+    If `values` is None, returns an all-missing column of length `size`."""
+    if values is None:
+        return Column(np.zeros(size, dtype=np.int64), np.zeros(size, dtype=bool))
+    values = np.asarray(values, dtype=np.int64)
+    if mask is None:
+        mask = np.ones(values.shape, dtype=bool)
+    else:
+        mask = np.asarray(mask, dtype=bool)
+        values = np.where(mask, values, 0)
+    return Column(values, mask)
+
+
+def ga_weeks(ga_days):
+    """Returns GA weeks from GA days rounded toward zero, as relativedelta.weeks."""
+    ga_days = np.asarray(ga_days)
+    return np.sign(ga_days) * (np.abs(ga_days) // 7)
+
+
+def lmp(lmp, reference_date):
+    """Returns (edd, ga_weeks, mask) as Lmp would for each row.
+
+    A row is only present if both the LMP and the reference date are present."""
+    mask = lmp.mask & reference_date.mask
+    edd = lmp.values + 280
+    diffweeks = np.abs(edd - reference_date.values) / 7.0
+    weeks = np.trunc(40 - diffweeks).astype(np.int64)
+    return np.where(mask, edd, 0), np.where(mask, weeks, 0), mask
+
+
+def ultrasound(ultrasound_date, ga_confirmed_weeks, ga_confirmed_days, ultrasound_edd):
+    """Returns (ga_days, status) as Ultrasound would for each row.
+
+    `ga_days` is the confirmed GA in days (weeks * 7 + days) and is only
+    meaningful where status is ULTRASOUND_OK."""
+    present = ultrasound_date.mask & ga_confirmed_weeks.mask & ultrasound_edd.mask
+    weeks = ga_confirmed_weeks.values
+    days = ga_confirmed_days.values
+    tdelta = ultrasound_edd.values - ultrasound_date.values
+    calculated_weeks = np.trunc((280 - tdelta) / 7.0)
+    status = np.select(
+        [~present,
+         (weeks <= 0) | (weeks >= 40),
+         (days < 0) | (days > 6),
+         calculated_weeks != weeks],
+        [ULTRASOUND_MISSING,
+         ULTRASOUND_INVALID_WEEKS,
+         ULTRASOUND_INVALID_DAYS,
+         ULTRASOUND_GA_MISMATCH],
+        ULTRASOUND_OK).astype(np.int8)
+    ga_days = np.where(status == ULTRASOUND_OK, weeks * 7 + days, 0)
+    return ga_days, status
+
+
+def edd(lmp_edd, lmp_ga_weeks, lmp_mask, ultrasound_edd, ultrasound_mask):
+    """Returns (edd, method, diffdays, edd_mask, diffdays_mask) as Edd would."""
+    both = lmp_mask & ultrasound_mask
+    diffdays = np.abs(lmp_edd - ultrasound_edd)
+    tolerance = np.select(
+        [(lmp_ga_weeks >= 16) & (lmp_ga_weeks <= 21),
+         (lmp_ga_weeks >= 22) & (lmp_ga_weeks <= 27),
+         lmp_ga_weeks >= 28],
+        [10, 14, 21],
+        -1)
+    decided = both & (tolerance >= 0)
+    use_lmp = (decided & (diffdays <= tolerance)) | (lmp_mask & ~ultrasound_mask)
+    use_ultrasound = (decided & (diffdays > tolerance)) | (ultrasound_mask & ~lmp_mask)
+    edd = np.where(use_lmp, lmp_edd, np.where(use_ultrasound, ultrasound_edd, 0))
+    method = np.where(use_lmp, LMP, np.where(use_ultrasound, ULTRASOUND, NO_METHOD))
+    diffdays = np.where(decided, diffdays, 0)
+    return edd, method.astype(np.int8), diffdays, use_lmp | use_ultrasound, decided
+
+
+def ga(lmp_date, reference_date, ultrasound_date, ultrasound_ga_days, ultrasound_mask,
+       prefer_ultrasound=True):
+    """Returns (ga_days, method, mask) as Ga would.
+
+    As in Ga, the LMP GA is calculated against the ultrasound date if
+    `prefer_ultrasound`, otherwise against the reference date, each falling
+    back to the other if missing."""
+    lmp_date = Column(lmp_date.values, lmp_date.mask & reference_date.mask)
+    if prefer_ultrasound:
+        first, second = Column(ultrasound_date.values, ultrasound_mask), reference_date
+    else:
+        first, second = reference_date, Column(ultrasound_date.values, ultrasound_mask)
+    reference_date = Column(
+        np.where(first.mask, first.values, second.values), first.mask | second.mask)
+    _, weeks, lmp_mask = lmp(lmp_date, reference_date)
+    lmp_mask = lmp_mask & (weeks != 0)
+    if prefer_ultrasound:
+        use_ultrasound = ultrasound_mask
+        use_lmp = lmp_mask & ~ultrasound_mask
+    else:
+        use_lmp = lmp_mask
+        use_ultrasound = ultrasound_mask & ~lmp_mask
+    ga_days = np.where(use_ultrasound, ultrasound_ga_days, np.where(use_lmp, weeks * 7, 0))
+    method = np.where(use_ultrasound, ULTRASOUND, np.where(use_lmp, LMP, NO_METHOD))
+    return ga_days, method.astype(np.int8), use_lmp | use_ultrasound
+
+
+def dating(lmp_date, reference_date, ultrasound_date, ga_confirmed_weeks, ga_confirmed_days,
+           ultrasound_edd, prefer_ultrasound=True):
+    """Returns a dict of result arrays for the confirmed EDD and the GA.
+
+    Keys are `edd`, `edd_method`, `edd_diffdays`, `ga_days`, `ga_weeks`,
+    `ga_method` and `ultrasound_status`, each value array (other than the
+    status) paired with a `<key>_mask`."""
+    lmp_edd, lmp_weeks, lmp_mask = lmp(lmp_date, reference_date)
+    ultrasound_ga_days, status = ultrasound(
+        ultrasound_date, ga_confirmed_weeks, ga_confirmed_days, ultrasound_edd)
+    ultrasound_mask = status == ULTRASOUND_OK
+    edd_, edd_method, diffdays, edd_mask, diffdays_mask = edd(
+        lmp_edd, lmp_weeks, lmp_mask, ultrasound_edd.values, ultrasound_mask)
+    ga_days, ga_method, ga_mask = ga(
+        lmp_date, reference_date, ultrasound_date, ultrasound_ga_days, ultrasound_mask,
+        prefer_ultrasound=prefer_ultrasound)
+    return dict(
+        edd=edd_, edd_mask=edd_mask,
+        edd_method=edd_method, edd_method_mask=edd_mask,
+        edd_diffdays=diffdays, edd_diffdays_mask=diffdays_mask,
+        ga_days=ga_days, ga_days_mask=ga_mask,
+        ga_weeks=ga_weeks(ga_days), ga_weeks_mask=ga_mask,
+        ga_method=ga_method, ga_method_mask=ga_mask,
+        ultrasound_status=status)
@@ -0,0 +1,133 @@
+import json
+
+from datetime import date, datetime
+
+from django.http import HttpResponseBadRequest, HttpResponseForbidden, StreamingHttpResponse
+from django.views.decorators.http import require_POST
+
+from .dating import PregnancyDating
+from .ultrasound import UltrasoundError
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+NDJSON = 'application/x-ndjson'
+DATE_FIELDS = ['lmp', 'reference_date', 'ultrasound_date', 'ultrasound_edd']
+INT_FIELDS = ['ga_confirmed_weeks', 'ga_confirmed_days']
+KEY_MIN = -2 ** 63
+KEY_MAX = 2 ** 63 - 1
+
+
+def dumps(obj):
+    if orjson:
+        return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE)
+    return json.dumps(obj, default=date.isoformat).encode() + b'\n'
+
+
+def parse_date(value):
+    if value is None or isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        return datetime.fromisoformat(value).date()
+
+
+def get_inputs(record):
+    """Returns the PregnancyDating arguments for a record or raises ValueError."""
+    if not isinstance(record, dict):
+        raise ValueError('Invalid record. Expected an object. Got {}.'.format(record))
+    inputs = {}
+    for name in DATE_FIELDS:
+        value = record.get(name)
+        try:
+            if value is not None and not isinstance(value, str):
+                raise ValueError
+            inputs[name] = parse_date(value)
+        except ValueError:
+            raise ValueError('Invalid {}. Expected an ISO date. Got {}.'.format(name, value))
+    for name in INT_FIELDS:
+        value = record.get(name)
+        if value is not None and (isinstance(value, bool) or not isinstance(value, int)):
+            raise ValueError('Invalid {}. Expected an integer. Got {}.'.format(name, value))
+        inputs[name] = value
+    if inputs['lmp'] and not inputs['reference_date']:
+        raise ValueError('Invalid reference_date. Expected a date with lmp. Got None.')
+    return inputs
+
+
+def get_key(index, record):
+    """Returns the record's `key`, or `index` if it has none, or raises ValueError."""
+    if not isinstance(record, dict) or record.get('key') is None:
+        return index
+    key = record['key']
+    if isinstance(key, str) or (
+            isinstance(key, int) and not isinstance(key, bool) and KEY_MIN <= key <= KEY_MAX):
+        return key
+    raise ValueError(
+        'Invalid key. Expected a string or a 64 bit integer. Got {}.'.format(key))
+
+
+def get_result(index, record):
+    """Returns a dict of the EDD and GA, or the error, for one record."""
+    result = dict(key=index)
+    try:
+        result.update(key=get_key(index, record))
+        dating = PregnancyDating(**get_inputs(record))
+    except (ValueError, UltrasoundError) as e:
+        result.update(error=str(e))
+    else:
+        result.update(
+            edd=dating.edd,
+            edd_method=dating.edd_method,
+            diffdays=dating.diffdays,
+            ga_weeks=dating.ga_weeks,
+            ga_method=dating.ga_method)
+    return result
+
+
+def iter_ndjson(request):
+    """Yields records, or the ValueError for an invalid line, from an NDJSON body."""
+    for line in request:
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                yield e
+
+
+@require_POST
+def batch_dating(request):
+    """Returns a streamed NDJSON response of EDD, GA and method per record.
+
+    Accepts a JSON array or NDJSON of records with `lmp`, `reference_date`,
+    `ultrasound_date`, `ga_confirmed_weeks`, `ga_confirmed_days` and
+    `ultrasound_edd` (ISO dates) and an optional `key` echoed back, otherwise
+    the row index is used. A key must be a string or a 64 bit integer.
+    Invalid records return an `error` instead.
+
+    The user must be authenticated by session, so AuthenticationMiddleware
+    is required, and as the session is a cookie the view is CSRF protected;
+    clients send the `csrftoken` cookie's value in an X-CSRFToken header."""
+    if not request.user.is_authenticated:
+        return HttpResponseForbidden('Authentication required.')
+    if request.content_type != NDJSON:
+        try:
+            records = json.loads(request.body)
+        except ValueError as e:
+            return HttpResponseBadRequest('Invalid JSON. Got {}'.format(e))
+        if not isinstance(records, list):
+            return HttpResponseBadRequest('Expected a JSON array of records.')
+    else:
+        records = iter_ndjson(request)
+
+    def stream():
+        for index, record in enumerate(records):
+            if isinstance(record, Exception):
+                yield dumps(dict(key=index, error='Invalid JSON. Got {}'.format(record)))
+            else:
+                yield dumps(get_result(index, record))
+
+    return StreamingHttpResponse(stream(), content_type=NDJSON)
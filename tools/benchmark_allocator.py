@@ -0,0 +1,78 @@
+"""Measures InfantSequenceAllocator throughput by block size and process count.
+
+Each process allocates sequence numbers two at a time for one study site,
+as a delivery of twins would, and the run reports infants/s over the
+slowest process and checks that no number was handed out twice. A block
+size of 1 is a counter update per delivery.
+
+    python tools/benchmark_allocator.py --block-sizes 1 50 --processes 1 2 4 8
+
+Point DJANGO_SETTINGS_MODULE at settings with a concrete model of
+InfantSequenceModelMixin, `--model`, on PostgreSQL or MySQL. The counter
+rows of `--study-site` are deleted before each run.
+"""
+import argparse
+import os
+import sys
+import time
+
+from multiprocessing import get_context
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def setup_django():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'edc_pregnancy_utils.settings')
+    import django
+    django.setup()
+
+
+def allocate(args):
+    """Returns the sequence numbers allocated by a process and the seconds taken."""
+    model_label, study_site, block_size, allocations = args
+    setup_django()
+    from django.apps import apps as django_apps
+    from django.db import connections
+    from edc_pregnancy_utils.allocators import InfantSequenceAllocator
+    model = django_apps.get_model(*model_label.split('.'))
+    allocator = InfantSequenceAllocator(model, block_size=block_size)
+    sequences = []
+    start = time.perf_counter()
+    for _ in range(allocations):
+        sequences.extend(allocator.allocate(study_site, 2))
+    seconds = time.perf_counter() - start
+    connections.close_all()
+    return sequences, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--model', default='edc_example.infantsequence')
+    parser.add_argument('--study-site', default='99')
+    parser.add_argument('--block-sizes', type=int, nargs='+', default=[1, 50])
+    parser.add_argument('--processes', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--allocations', type=int, default=200, help='per process')
+    args = parser.parse_args()
+    setup_django()
+    from django.apps import apps as django_apps
+    from django.db import connections
+    model = django_apps.get_model(*args.model.split('.'))
+    print('{:>10} {:>9} {:>12} {:>10}'.format(
+        'block_size', 'processes', 'infants/s', 'duplicates'))
+    for block_size in args.block_sizes:
+        for processes in args.processes:
+            model.objects.filter(study_site=args.study_site).delete()
+            connections.close_all()
+            with get_context('spawn').Pool(processes) as pool:
+                results = pool.map(
+                    allocate,
+                    [(args.model, args.study_site, block_size, args.allocations)] * processes)
+            sequences = [sequence for result, _ in results for sequence in result]
+            seconds = max(seconds for _, seconds in results)
+            print('{:>10} {:>9} {:>12.0f} {:>10}'.format(
+                block_size, processes, len(sequences) / seconds,
+                len(sequences) - len(set(sequences))))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""Compares PregnancyDating with Lmp, Ultrasound, Edd and Ga.
+
+    python tools/benchmark_dating.py --number 20000
+"""
+import argparse
+import os
+import sys
+import timeit
+
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from edc_pregnancy_utils import Edd, Ga, Lmp, Ultrasound  # noqa: E402
+from edc_pregnancy_utils.dating import PregnancyDating  # noqa: E402
+
+REFERENCE_DATE = date(2016, 10, 15)
+ROW = dict(
+    lmp=REFERENCE_DATE - timedelta(weeks=21),
+    reference_date=REFERENCE_DATE,
+    ultrasound_date=REFERENCE_DATE,
+    ga_confirmed_weeks=22,
+    ga_confirmed_days=None,
+    ultrasound_edd=REFERENCE_DATE + timedelta(weeks=40 - 22))
+
+
+def classes():
+    lmp = Lmp(lmp=ROW['lmp'], reference_date=ROW['reference_date'])
+    ultrasound = Ultrasound(
+        ROW['ultrasound_date'], ROW['ga_confirmed_weeks'], ROW['ga_confirmed_days'],
+        ROW['ultrasound_edd'])
+    Edd(lmp=lmp, ultrasound=ultrasound)
+    Ga(lmp, ultrasound).weeks
+    Ga(lmp, ultrasound, prefer_ultrasound=False).weeks
+
+
+def single_pass():
+    dating = PregnancyDating(**ROW)
+    dating.ga_weeks
+    dating.ga_weeks_lmp_preferred
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--number', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    results = {}
+    for name, func in [('classes', classes), ('PregnancyDating', single_pass)]:
+        best = min(timeit.repeat(func, number=args.number, repeat=args.repeat))
+        results[name] = best
+        print('{:<16} {:>8.2f} us/row'.format(name, best / args.number * 1e6))
+    print('speedup          {:>8.1f}x'.format(results['classes'] / results['PregnancyDating']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""Measures DatingExecutor throughput by thread count.
+
+Run it on a standard and a free-threaded (e.g. python3.13t) build to
+compare scaling with and without the GIL:
+
+    python tools/benchmark_threads.py --rows 200000 --threads 1 2 4 8
+"""
+import argparse
+import os
+import random
+import sys
+import sysconfig
+import time
+
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from edc_pregnancy_utils.executor import DatingExecutor  # noqa: E402
+
+
+def records(rows, seed):
+    rng = random.Random(seed)
+    for _ in range(rows):
+        reference_date = date(2016, 1, 1) + timedelta(days=rng.randint(0, 1000))
+        weeks, days = rng.randint(10, 39), rng.randint(0, 6)
+        ultrasound = rng.random() < 0.6
+        yield dict(
+            lmp=reference_date - timedelta(days=weeks * 7 + days + rng.randint(-10, 10)),
+            reference_date=reference_date,
+            ultrasound_date=reference_date if ultrasound else None,
+            ga_confirmed_weeks=weeks if ultrasound else None,
+            ga_confirmed_days=days if ultrasound else None,
+            ultrasound_edd=(reference_date + timedelta(days=280 - weeks * 7 - days)
+                            if ultrasound else None))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    data = list(records(args.rows, args.seed))
+    gil_enabled = getattr(sys, '_is_gil_enabled', lambda: True)()
+    free_threaded = bool(sysconfig.get_config_var('Py_GIL_DISABLED'))
+    print('python {} free-threaded build: {}, GIL enabled: {}'.format(
+        sys.version.split()[0], free_threaded, gil_enabled))
+    baseline = None
+    for threads in args.threads:
+        with DatingExecutor(max_workers=threads, chunk_size=args.chunk_size) as executor:
+            start = time.perf_counter()
+            executor.map(data)
+            seconds = time.perf_counter() - start
+        rate = args.rows / seconds
+        baseline = baseline or rate
+        print('threads {:>3}  {:>10.0f} rows/s  {:>5.2f}x'.format(
+            threads, rate, rate / baseline))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+"""Load-tests the delivery and birth registration save paths.
+
+Drives synthetic deliveries of mixed multiplicity through
+LabourAndDeliveryModelMixin.save and BirthModelMixin.save on the
+edc_example models from N concurrent worker processes and reports
+throughput, p50/p99 latency and queries per delivery. Latency and
+queries cover the delivery and birth saves; throughput is over wall time
+and so includes enrolling each mother.
+
+A delivery that raises, for example an OperationalError when SQLite is
+locked or an IntegrityError on a duplicate identifier, is counted as
+failed and the worker continues. Failures are reported per worker and by
+exception next to the error rate; throughput and latency are of the
+deliveries saved.
+
+    python tools/loadtest_delivery.py --workers 4 --deliveries 200 --migrate
+
+Point DJANGO_SETTINGS_MODULE at settings with `edc_example` installed and a
+file-based SQLite or a PostgreSQL database; each worker opens its own connection.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+from collections import Counter
+from multiprocessing import get_context
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DELIVERY_MODEL = 'edc_example.maternallabdel'
+ENROLLMENT_MODEL = 'edc_example.enrollment'
+
+
+def setup_django():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'edc_pregnancy_utils.settings')
+    import django
+    django.setup()
+
+
+def parse_multiplicity(value):
+    """Returns a list of (live_infants, weight) from e.g. "1:97,2:2.5,3:0.5"."""
+    multiplicity = []
+    for item in value.split(','):
+        live_infants, weight = item.split(':')
+        multiplicity.append((int(live_infants), float(weight)))
+    return multiplicity
+
+
+def deliver(live_infants, seed):
+    """Enrolls a mother, saves her delivery and births, returns (seconds, queries)."""
+    from django.apps import apps as django_apps
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from django.utils import timezone
+    from edc_constants.constants import NO
+    from edc_identifier.maternal_identifier import MaternalIdentifier
+
+    delivery_model = django_apps.get_model(*DELIVERY_MODEL.split('.'))
+    birth_model = django_apps.get_model(*delivery_model._meta.birth_model.split('.'))
+    mother = MaternalIdentifier(
+        subject_type_name='subject',
+        model=ENROLLMENT_MODEL,
+        protocol='000',
+        device_id='99',
+        study_site='40',
+        last_name='Mother{}'.format(seed))
+    delivery_datetime = timezone.now()
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        delivery = delivery_model.objects.create(
+            subject_identifier=mother.identifier,
+            live_infants=live_infants,
+            live_infants_to_register=live_infants,
+            delivery_datetime=delivery_datetime,
+            delivery_time_estimated=NO)
+        for birth_order in range(1, live_infants + 1):
+            birth_model.objects.create(
+                delivery_reference=delivery.reference,
+                birth_order=birth_order,
+                birth_order_denominator=live_infants,
+                dob=timezone.localtime(delivery_datetime).date(),
+                gender='M' if birth_order % 2 else 'F')
+        seconds = time.perf_counter() - start
+    return seconds, len(queries)
+
+
+def worker(args):
+    """Runs a worker's share of deliveries, returns a list of (seconds, queries)
+    for the deliveries saved and a Counter of failures by exception."""
+    worker_id, deliveries, multiplicity, seed = args
+    setup_django()
+    rng = random.Random(seed + worker_id)
+    sizes, weights = zip(*multiplicity)
+    results = []
+    failures = Counter()
+    for index in range(deliveries):
+        live_infants = rng.choices(sizes, weights)[0]
+        try:
+            results.append(deliver(live_infants, seed='{}{}{}'.format(seed, worker_id, index)))
+        except Exception as e:
+            failures['{}: {}'.format(e.__class__.__name__, str(e)[:60].split('\n')[0])] += 1
+    return results, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--deliveries', type=int, default=100, help='per worker')
+    parser.add_argument('--multiplicity', type=parse_multiplicity, default='1:97,2:2.5,3:0.5')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--migrate', action='store_true', help='migrate the database first')
+    args = parser.parse_args()
+    setup_django()
+    if args.migrate:
+        from django.core.management import call_command
+        call_command('migrate', verbosity=0)
+    from django.db import connections
+    connections.close_all()
+    jobs = [(worker_id, args.deliveries, args.multiplicity, args.seed)
+            for worker_id in range(args.workers)]
+    start = time.perf_counter()
+    with get_context('spawn').Pool(args.workers) as pool:
+        worker_results = pool.map(worker, jobs)
+    elapsed = time.perf_counter() - start
+    results = [result for results, _ in worker_results for result in results]
+    failures = sum((failures for _, failures in worker_results), Counter())
+    attempted = args.workers * args.deliveries
+    print('workers             {}'.format(args.workers))
+    print('deliveries          {} saved, {} failed'.format(
+        len(results), sum(failures.values())))
+    print('throughput          {:.1f} deliveries/s'.format(len(results) / elapsed))
+    print('error rate          {:.1%}'.format(sum(failures.values()) / attempted))
+    if results:
+        latencies = sorted(seconds * 1000 for seconds, _ in results)
+        if len(latencies) == 1:
+            latencies = latencies * 2
+        percentiles = statistics.quantiles(latencies, n=100, method='inclusive')
+        print('latency p50         {:.1f} ms'.format(percentiles[49]))
+        print('latency p99         {:.1f} ms'.format(percentiles[98]))
+        print('queries/delivery    {:.1f}'.format(statistics.mean(q for _, q in results)))
+    for worker_id, (_, worker_failures) in enumerate(worker_results):
+        if worker_failures:
+            print('worker {} failed     {}'.format(worker_id, sum(worker_failures.values())))
+    for error, count in failures.most_common():
+        print('  {:>5}  {}'.format(count, error))
+
+
+if __name__ == '__main__':
+    main()